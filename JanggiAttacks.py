@@ -0,0 +1,118 @@
+# Incrementally maintained attack maps for a Janggi position. For each team the map counts how many pieces attack
+# every square, so attack and attacker count queries are a list lookup. When a square changes only the pieces that
+# can see it are recomputed: the piece on the square itself, chariots and cannons on a line through it, and horses and
+# elephants with a leg on it. Squares are integer square indexes (see JanggiTables).
+
+from JanggiTables import (EMPTY, TEAM_CODES, HORSE, ELEPHANT, CHARIOT, CANNON, SOLDIER, LINE_RAYS, HORSE_MOVES,
+                          ELEPHANT_MOVES, PALACE_MOVES, SOLDIER_MOVES, HORSE_LEG_ORIGINS, ELEPHANT_LEG_ORIGINS)
+
+
+def attacked_by_piece(square, squares):
+    """
+    Return tuple of the squares attacked by the piece on square, given the flat list of board squares. Squares held by
+    the piece's own team are included (they are defended), cannons never attack a square holding a cannon.
+    """
+    piece = squares[square]
+    if piece is EMPTY:
+        return ()
+    kind = piece.kind
+    if kind == CHARIOT or kind == CANNON:
+        attacks = []
+        for ray in LINE_RAYS[square]:
+            screen = False
+            for next_square in ray:
+                value = squares[next_square]
+                if kind == CHARIOT:
+                    attacks.append(next_square)
+                    if value is not EMPTY:
+                        break
+                elif value is EMPTY:
+                    if screen:
+                        attacks.append(next_square)
+                # cannons cannot jump or capture cannons
+                elif value.kind == CANNON:
+                    break
+                elif not screen:
+                    screen = True
+                else:
+                    attacks.append(next_square)
+                    break
+        return tuple(attacks)
+    if kind == HORSE:
+        return tuple(move for leg, move in HORSE_MOVES[square] if squares[leg] is EMPTY)
+    if kind == ELEPHANT:
+        return tuple(move for leg, second_leg, move in ELEPHANT_MOVES[square]
+                     if squares[leg] is EMPTY and squares[second_leg] is EMPTY)
+    if kind == SOLDIER:
+        return SOLDIER_MOVES[piece.team][square]
+    return PALACE_MOVES[piece.team][square]
+
+
+class AttackMap:
+    """
+    Per team attack counts for every square of a GameBoard. Built from the board, then kept up to date by calling
+    update_square after each change of a square (GameBoard does this itself once the map is attached to it).
+    """
+    def __init__(self, gameboard):
+        """Init AttackMap by computing the attacks of every piece on gameboard"""
+        self._squares = gameboard.get_squares()
+        self._counts = ([0] * 90, [0] * 90)
+        # Squares attacked by the piece on each square, as last added to the counts
+        self._attacks = [()] * 90
+        self._attack_team = [None] * 90
+        for square in range(90):
+            self._refresh(square)
+
+    def _refresh(self, square):
+        """Recompute the attacks of the piece on square and update the counts by the difference"""
+        old_attacks = self._attacks[square]
+        if old_attacks:
+            counts = self._counts[self._attack_team[square]]
+            for target in old_attacks:
+                counts[target] -= 1
+        piece = self._squares[square]
+        if piece is EMPTY:
+            self._attacks[square] = ()
+            return
+        new_attacks = attacked_by_piece(square, self._squares)
+        counts = self._counts[piece.team]
+        for target in new_attacks:
+            counts[target] += 1
+        self._attacks[square] = new_attacks
+        self._attack_team[square] = piece.team
+
+    def update_square(self, square):
+        """Update the map after the contents of square changed"""
+        squares = self._squares
+        self._refresh(square)
+        # Chariots and cannons looking along a line through square
+        for ray in LINE_RAYS[square]:
+            for next_square in ray:
+                value = squares[next_square]
+                if value is not EMPTY and (value.kind == CHARIOT or value.kind == CANNON):
+                    self._refresh(next_square)
+        # Horses and elephants with a leg on square
+        for origin in HORSE_LEG_ORIGINS[square]:
+            value = squares[origin]
+            if value is not EMPTY and value.kind == HORSE:
+                self._refresh(origin)
+        for origin in ELEPHANT_LEG_ORIGINS[square]:
+            value = squares[origin]
+            if value is not EMPTY and value.kind == ELEPHANT:
+                self._refresh(origin)
+
+    def get_attack_counts(self, team):
+        """Return list of the number of pieces of team (string or team code) attacking each square"""
+        return self._counts[TEAM_CODES[team]]
+
+    def count_attackers(self, square, team):
+        """Return the number of pieces of team (string or team code) attacking square"""
+        return self._counts[TEAM_CODES[team]][square]
+
+    def is_square_attacked(self, square, by_team):
+        """Return True if any piece of by_team (string or team code) attacks square"""
+        return self._counts[TEAM_CODES[by_team]][square] > 0
+
+    def get_attacks_from(self, square):
+        """Return tuple of the squares attacked by the piece on square"""
+        return self._attacks[square]
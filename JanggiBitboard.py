@@ -0,0 +1,242 @@
+# Bitboard representation of a Janggi position. The 90 squares map onto the bits of a Python int (bit n is square
+# index n, see JanggiTables), with one int per team and piece type plus occupancy masks. Attack masks for the short
+# range pieces are precomputed per square, chariot and cannon attacks are found along precomputed rays. This is an
+# alternative backend to GameBoard for whole board queries, such as every square attacked by a team. GameBoard keeps an
+# attached BitBoard in sync with its squares, see JanggiGame.enable_bitboard.
+
+from JanggiTables import (SQUARE_NAMES, EMPTY, RED, BLUE, TEAM_CODES, PIECE_TYPE_CODES, HORSE, ELEPHANT, CHARIOT,
+                          CANNON, SOLDIER, BOTH_PALACE_SQUARES, BOTH_DIAG_PALACE_SQUARES, HORSE_MOVES, ELEPHANT_MOVES,
+                          PALACE_MOVES, SOLDIER_MOVES, offset_square)
+
+FULL_MASK = (1 << 90) - 1
+
+# Ray directions (col_delta, row_delta). Square indexes increase along the first four and decrease along the rest,
+# which decides whether the nearest blocker on a ray is its lowest or highest set bit
+INCREASING_DIRECTIONS = ((0, 1), (1, 0), (1, 1), (-1, 1))
+DECREASING_DIRECTIONS = ((0, -1), (-1, 0), (-1, -1), (1, -1))
+
+
+def square_mask(square):
+    """Return a mask with only the bit of square set"""
+    return 1 << square
+
+
+def mask_to_squares(mask):
+    """Yield the square indexes of the set bits of mask, lowest first"""
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+def mask_to_locations(mask):
+    """Return list of string locations of the set bits of mask"""
+    return [SQUARE_NAMES[square] for square in mask_to_squares(mask)]
+
+
+def _build_ray_mask(square, col_delta, row_delta):
+    """Return mask of the squares walked from square in a direction. Diagonal rays stay inside the palace"""
+    diagonal = col_delta != 0 and row_delta != 0
+    if diagonal and square not in BOTH_DIAG_PALACE_SQUARES:
+        return 0
+    mask = 0
+    next_square = offset_square(square, col_delta, row_delta)
+    while next_square is not None and (not diagonal or next_square in BOTH_PALACE_SQUARES):
+        mask |= 1 << next_square
+        next_square = offset_square(next_square, col_delta, row_delta)
+    return mask
+
+
+def _mask_of(squares):
+    """Return mask with the bits of all squares set"""
+    mask = 0
+    for square in squares:
+        mask |= 1 << square
+    return mask
+
+
+# Ray masks per direction, each indexed by square. The ray beyond a blocker is the same direction's ray from the blocker
+INCREASING_RAYS = tuple(tuple(_build_ray_mask(square, col_delta, row_delta) for square in range(90))
+                        for col_delta, row_delta in INCREASING_DIRECTIONS)
+DECREASING_RAYS = tuple(tuple(_build_ray_mask(square, col_delta, row_delta) for square in range(90))
+                        for col_delta, row_delta in DECREASING_DIRECTIONS)
+
+# Short range attack masks, indexed by team code and square. Horses and elephants keep the mask of their leg squares
+# next to each destination
+PALACE_ATTACKS = tuple(tuple(_mask_of(PALACE_MOVES[team][square]) for square in range(90)) for team in (RED, BLUE))
+SOLDIER_ATTACK_MASKS = tuple(tuple(_mask_of(SOLDIER_MOVES[team][square]) for square in range(90))
+                             for team in (RED, BLUE))
+HORSE_LEG_ATTACKS = tuple(tuple((1 << leg, 1 << move) for leg, move in HORSE_MOVES[square]) for square in range(90))
+ELEPHANT_LEG_ATTACKS = tuple(tuple(((1 << leg) | (1 << second_leg), 1 << move)
+                                   for leg, second_leg, move in ELEPHANT_MOVES[square]) for square in range(90))
+
+
+class BitBoard:
+    """
+    Bitboard Janggi position. Holds one 90 bit int per team and piece type, an occupancy mask per team, and a
+    square list of (team code, piece type code) for finding the piece on a square. Squares are integer square indexes,
+    teams and piece types can be given as strings or codes.
+    """
+    def __init__(self):
+        """Init an empty BitBoard"""
+        # Piece masks are indexed by team code * 7 + piece type code, occupancy masks by team code
+        self._pieces = [0] * 14
+        self._occupancy = [0, 0]
+        self._squares = [None] * 90
+
+    @classmethod
+    def from_game_board(cls, gameboard):
+        """Return a BitBoard holding the same pieces as a GameBoard"""
+        bitboard = cls()
+        for square, value in enumerate(gameboard.get_squares()):
+            if value is not EMPTY:
+                bitboard.set_piece(square, value.team, value.kind)
+        return bitboard
+
+    def get_pieces(self, team, piece_type):
+        """Return mask of the squares holding pieces of a team and type"""
+        return self._pieces[TEAM_CODES[team] * 7 + PIECE_TYPE_CODES[piece_type]]
+
+    def get_occupancy(self, team=None):
+        """Return mask of the squares occupied by a team, or by either team if team is None"""
+        if team is None:
+            return self._occupancy[RED] | self._occupancy[BLUE]
+        return self._occupancy[TEAM_CODES[team]]
+
+    def get_piece(self, square):
+        """Return (team code, piece type code) of the piece on square, or None if the square is empty"""
+        return self._squares[square]
+
+    def set_piece(self, square, team, piece_type):
+        """Place a piece of team and piece_type on square, replacing anything already there"""
+        self.remove_piece(square)
+        team = TEAM_CODES[team]
+        piece_type = PIECE_TYPE_CODES[piece_type]
+        bit = 1 << square
+        self._pieces[team * 7 + piece_type] |= bit
+        self._occupancy[team] |= bit
+        self._squares[square] = (team, piece_type)
+
+    def remove_piece(self, square):
+        """Remove the piece on square, if any, and return its (team code, piece type code) or None"""
+        piece = self._squares[square]
+        if piece is not None:
+            team, piece_type = piece
+            bit = 1 << square
+            self._pieces[team * 7 + piece_type] &= ~bit
+            self._occupancy[team] &= ~bit
+            self._squares[square] = None
+        return piece
+
+    def move_piece(self, from_square, to_square):
+        """Move the piece on from_square to to_square and return the captured (team code, piece type code) or None"""
+        captured = self.remove_piece(to_square)
+        team, piece_type = self.remove_piece(from_square)
+        self.set_piece(to_square, team, piece_type)
+        return captured
+
+    def _line_attacks(self, square, occupied, cannon):
+        """
+        Return mask of squares attacked along every ray from square, by a chariot, or by a cannon if cannon is True.
+        Chariots attack up to and including the first piece. Cannons need a non cannon screen, and attack beyond it up
+        to and including the next piece, unless that piece is a cannon.
+        """
+        cannons = self._pieces[RED * 7 + CANNON] | self._pieces[BLUE * 7 + CANNON]
+        attacks = 0
+        for rays in INCREASING_RAYS:
+            ray = rays[square]
+            blockers = ray & occupied
+            if not blockers:
+                if not cannon:
+                    attacks |= ray
+                continue
+            first = blockers & -blockers
+            first_square = first.bit_length() - 1
+            if not cannon:
+                attacks |= ray & ~rays[first_square]
+                continue
+            if first & cannons:
+                continue
+            beyond = rays[first_square]
+            blockers = beyond & occupied
+            if not blockers:
+                attacks |= beyond
+                continue
+            second = blockers & -blockers
+            attacks |= beyond & ~rays[second.bit_length() - 1] & ~(second & cannons)
+        for rays in DECREASING_RAYS:
+            ray = rays[square]
+            blockers = ray & occupied
+            if not blockers:
+                if not cannon:
+                    attacks |= ray
+                continue
+            first_square = blockers.bit_length() - 1
+            first = 1 << first_square
+            if not cannon:
+                attacks |= ray & ~rays[first_square]
+                continue
+            if first & cannons:
+                continue
+            beyond = rays[first_square]
+            blockers = beyond & occupied
+            if not blockers:
+                attacks |= beyond
+                continue
+            second_square = blockers.bit_length() - 1
+            attacks |= beyond & ~rays[second_square] & ~((1 << second_square) & cannons)
+        return attacks
+
+    def attack_mask(self, square):
+        """
+        Return mask of the squares attacked by the piece on square, including squares held by its own team, or 0 for
+        an empty square. Cannons never attack squares holding a cannon.
+        """
+        piece = self._squares[square]
+        if piece is None:
+            return 0
+        team, piece_type = piece
+        if piece_type == CHARIOT or piece_type == CANNON:
+            occupied = self._occupancy[RED] | self._occupancy[BLUE]
+            return self._line_attacks(square, occupied, piece_type == CANNON)
+        if piece_type == HORSE or piece_type == ELEPHANT:
+            occupied = self._occupancy[RED] | self._occupancy[BLUE]
+            table = HORSE_LEG_ATTACKS if piece_type == HORSE else ELEPHANT_LEG_ATTACKS
+            attacks = 0
+            for legs, move in table[square]:
+                if not legs & occupied:
+                    attacks |= move
+            return attacks
+        if piece_type == SOLDIER:
+            return SOLDIER_ATTACK_MASKS[team][square]
+        return PALACE_ATTACKS[team][square]
+
+    def move_mask(self, square):
+        """Return mask of the squares the piece on square can move to, ignoring whether its general is left in check"""
+        piece = self._squares[square]
+        if piece is None:
+            return 0
+        return self.attack_mask(square) & ~self._occupancy[piece[0]]
+
+    def movable_squares(self, team):
+        """Return mask of every square a piece of team can move to, ignoring whether its general is left in check"""
+        team = TEAM_CODES[team]
+        moves = 0
+        for square in mask_to_squares(self._occupancy[team]):
+            moves |= self.attack_mask(square)
+        return moves & ~self._occupancy[team]
+
+    def attacked_squares(self, team):
+        """Return mask of every square attacked by a piece of team"""
+        attacks = 0
+        for square in mask_to_squares(self._occupancy[TEAM_CODES[team]]):
+            attacks |= self.attack_mask(square)
+        return attacks
+
+    def is_square_attacked(self, square, by_team):
+        """Return True if any piece of by_team attacks square"""
+        bit = 1 << square
+        for origin in mask_to_squares(self._occupancy[TEAM_CODES[by_team]]):
+            if self.attack_mask(origin) & bit:
+                return True
+        return False
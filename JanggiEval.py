@@ -0,0 +1,191 @@
+# Evaluation of Janggi positions for the AI. Material and piece-square scores are kept up to date incrementally by
+# GameBoard.set_square_at, so a leaf evaluation only adds the terms that depend on the whole position: mobility of the
+# chariots, cannons and horses, and the safety of each general's palace. Also provides the official point count used
+# to adjudicate unfinished games. Squares are integer square indexes (see JanggiTables).
+
+from JanggiTables import (EMPTY, RED, BLUE, TEAM_CODES, HORSE, CHARIOT, CANNON, GUARD, PALACE_SQUARES, PALACE_MOVES)
+
+# Material values per piece type code (General, Guard, Horse, Elephant, Chariot, Cannon, Soldier), in tenths of the
+# official points. The general is never captured, so it is worth nothing
+MATERIAL_VALUES = (0, 30, 50, 30, 130, 70, 20)
+
+# Official Janggi point values per piece type code, and the deom (compensation) for red, who moves second
+POINT_VALUES = (0, 3, 5, 3, 13, 7, 2)
+DEOM = 1.5
+
+# Piece-square tables, seen from red's side: the first line is row 1 (red's back rank), columns a to i. Blue uses the
+# same tables mirrored top to bottom
+_GENERAL_TABLE = (
+    0, 0, 0, -4, -6, -4, 0, 0, 0,
+    0, 0, 0, -2, 6, -2, 0, 0, 0,
+    0, 0, 0, -6, -2, -6, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+)
+_GUARD_TABLE = (
+    0, 0, 0, 2, 0, 2, 0, 0, 0,
+    0, 0, 0, 2, 4, 2, 0, 0, 0,
+    0, 0, 0, -2, 0, -2, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+)
+_HORSE_TABLE = (
+    -8, -4, -2, -2, -2, -2, -2, -4, -8,
+    -4, 0, 2, 0, 0, 0, 2, 0, -4,
+    -4, 2, 4, 4, 2, 4, 4, 2, -4,
+    -4, 2, 4, 6, 6, 6, 4, 2, -4,
+    -2, 4, 6, 8, 8, 8, 6, 4, -2,
+    -2, 4, 6, 8, 8, 8, 6, 4, -2,
+    -2, 4, 8, 10, 10, 10, 8, 4, -2,
+    -4, 2, 6, 10, 8, 10, 6, 2, -4,
+    -4, 0, 4, 6, 4, 6, 4, 0, -4,
+    -8, -4, -2, 0, -2, 0, -2, -4, -8,
+)
+_ELEPHANT_TABLE = (
+    -4, -2, 0, 0, -2, 0, 0, -2, -4,
+    -2, 0, 2, 0, 0, 0, 2, 0, -2,
+    -2, 2, 2, 4, 2, 4, 2, 2, -2,
+    -2, 0, 4, 4, 4, 4, 4, 0, -2,
+    -2, 2, 4, 4, 4, 4, 4, 2, -2,
+    -2, 2, 4, 4, 4, 4, 4, 2, -2,
+    -2, 2, 4, 6, 6, 6, 4, 2, -2,
+    -2, 0, 2, 4, 4, 4, 2, 0, -2,
+    -4, -2, 0, 2, 2, 2, 0, -2, -4,
+    -6, -4, -2, -2, -2, -2, -2, -4, -6,
+)
+_CHARIOT_TABLE = (
+    -2, 0, 0, 2, 0, 2, 0, 0, -2,
+    0, 2, 2, 2, 2, 2, 2, 2, 0,
+    0, 2, 2, 2, 2, 2, 2, 2, 0,
+    0, 2, 2, 2, 2, 2, 2, 2, 0,
+    2, 4, 4, 4, 4, 4, 4, 4, 2,
+    2, 4, 4, 4, 4, 4, 4, 4, 2,
+    4, 6, 6, 6, 6, 6, 6, 6, 4,
+    4, 6, 6, 10, 10, 10, 6, 6, 4,
+    6, 8, 8, 12, 12, 12, 8, 8, 6,
+    2, 4, 4, 8, 8, 8, 4, 4, 2,
+)
+_CANNON_TABLE = (
+    0, 0, 2, 4, 4, 4, 2, 0, 0,
+    0, 2, 2, 4, 6, 4, 2, 2, 0,
+    2, 2, 2, 4, 8, 4, 2, 2, 2,
+    0, 0, 0, 0, 2, 0, 0, 0, 0,
+    0, 0, 0, 0, 2, 0, 0, 0, 0,
+    0, 0, 0, 0, 2, 0, 0, 0, 0,
+    0, 0, 0, 0, 2, 0, 0, 0, 0,
+    2, 2, 2, 4, 6, 4, 2, 2, 2,
+    0, 2, 2, 4, 4, 4, 2, 2, 0,
+    0, 0, 2, 4, 2, 4, 2, 0, 0,
+)
+_SOLDIER_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 2, 0, 0, 0, 0,
+    2, 0, 4, 0, 6, 0, 4, 0, 2,
+    4, 4, 6, 8, 10, 8, 6, 4, 4,
+    8, 8, 10, 14, 16, 14, 10, 8, 8,
+    10, 12, 14, 20, 22, 20, 14, 12, 10,
+    10, 12, 16, 22, 26, 22, 16, 12, 10,
+    4, 6, 8, 12, 14, 12, 8, 6, 4,
+)
+PIECE_SQUARE_TABLES = (_GENERAL_TABLE, _GUARD_TABLE, _HORSE_TABLE, _ELEPHANT_TABLE, _CHARIOT_TABLE, _CANNON_TABLE,
+                       _SOLDIER_TABLE)
+
+
+def mirror_square(square):
+    """Return the square seen from the other side of the board: same column, row 11 - row"""
+    return (9 - square // 9) * 9 + square % 9
+
+
+# Material plus piece-square score of every piece on every square, indexed by team code, piece type code and square
+PIECE_SQUARE_SCORES = tuple(
+    tuple(tuple(MATERIAL_VALUES[kind] + PIECE_SQUARE_TABLES[kind][square if team == RED else mirror_square(square)]
+                for square in range(90)) for kind in range(7))
+    for team in (RED, BLUE))
+
+# Bonus per destination for the pieces whose freedom to move matters most
+MOBILITY_WEIGHTS = {CHARIOT: 1, CANNON: 1, HORSE: 2}
+
+# Penalties for each square next to the general that the enemy attacks, and for each enemy attacking piece standing in
+# the palace
+PALACE_ATTACK_PENALTY = 4
+PALACE_INTRUDER_PENALTY = 8
+
+# Mobility and palace safety rarely move the evaluation by more than this, so when the incremental score alone is this
+# far outside the search window the whole position terms are skipped
+LAZY_MARGIN = 60
+
+
+def mobility(game, team):
+    """Return the mobility score of team (string or team code): weighted move counts of chariots, cannons and horses"""
+    team = TEAM_CODES[team]
+    board = game.get_janggi_board()
+    score = 0
+    for square, piece in enumerate(board.get_squares()):
+        if piece is not EMPTY and piece.team == team and piece.kind in MOBILITY_WEIGHTS:
+            score += MOBILITY_WEIGHTS[piece.kind] * len(piece.destinations(square, board))
+    return score
+
+
+def palace_safety(game, team):
+    """
+    Return the palace safety score of team (string or team code), zero or below: penalties for enemy attacks on the
+    squares next to the general and for enemy pieces other than the general and guards inside the palace
+    """
+    team = TEAM_CODES[team]
+    enemy_team = 1 - team
+    squares = game.get_janggi_board().get_squares()
+    score = 0
+    for square in PALACE_MOVES[team][game.get_general_square(team)]:
+        if game.is_square_attacked(square, enemy_team):
+            score -= PALACE_ATTACK_PENALTY
+    for square in PALACE_SQUARES[team]:
+        piece = squares[square]
+        if piece is not EMPTY and piece.team == enemy_team and piece.kind > GUARD:
+            score -= PALACE_INTRUDER_PENALTY
+    return score
+
+
+def evaluate(game, alpha=None, beta=None):
+    """
+    Return evaluation of game in tenths of points from the point of view of the player to move: the incrementally
+    maintained material and piece-square scores, plus mobility and palace safety. If the search window (alpha, beta)
+    is given and the incremental score is more than LAZY_MARGIN outside it, the incremental score is returned as is.
+    """
+    red_score, blue_score = game.get_janggi_board().get_scores()
+    sign = 1 if TEAM_CODES[game.get_player_turn()] == RED else -1
+    score = sign * (red_score - blue_score)
+    if alpha is not None and (score + LAZY_MARGIN <= alpha or score - LAZY_MARGIN >= beta):
+        return score
+    score += sign * (mobility(game, RED) - mobility(game, BLUE))
+    score += sign * (palace_safety(game, RED) - palace_safety(game, BLUE))
+    return score
+
+
+def point_count(game, team):
+    """Return the official point count of team (string or team code), including the deom for red"""
+    team = TEAM_CODES[team]
+    points = game.get_janggi_board().get_points()[team]
+    if team == RED:
+        return points + DEOM
+    return points
+
+
+def adjudicate_on_points(game):
+    """
+    Return the game state of an unfinished game decided on points, 'RED_WON' or 'BLUE_WON'. The deom rules out ties
+    """
+    if point_count(game, RED) > point_count(game, BLUE):
+        return 'RED_WON'
+    return 'BLUE_WON'
@@ -2,29 +2,56 @@
 # Date: 2/22/2021
 # A program that implements Classes to play the board game "Janggi" aka Korean chess
 
-from termcolor import colored
-import pygame
+from collections import namedtuple
 import os
-import random
+from JanggiTables import (BOARD_COLUMNS, SQUARE_NAMES, SQUARE_INDEX, EMPTY, TEAMS, TEAM_CODES, RED, BLUE, GENERAL,
+                          GUARD, HORSE, ELEPHANT, CHARIOT, CANNON, SOLDIER, RED_PALACE, BLUE_PALACE, RED_DIAG_PALACE,
+                          BLUE_DIAG_PALACE, LINE_RAYS, HORSE_MOVES, ELEPHANT_MOVES, PALACE_MOVES, SOLDIER_MOVES,
+                          HORSE_ATTACKS, ELEPHANT_ATTACKS, SOLDIER_ATTACKS, ZOBRIST_PIECE_KEYS, ZOBRIST_RED_TURN_KEY)
+from JanggiSearch import Searcher, TranspositionTable, MoveOrderer
+from JanggiAttacks import AttackMap
+from JanggiBitboard import BitBoard, mask_to_squares
+from JanggiEval import PIECE_SQUARE_SCORES, POINT_VALUES
+
+# Status of a position, see JanggiGame.get_status. in_check is a (red, blue) tuple of bools, checkers the squares of the
+# pieces giving check to the player to move, and legal_move_count the number of legal moves of the player to move
+GameStatus = namedtuple('GameStatus', ['player_turn', 'game_state', 'in_check', 'checkers', 'legal_move_count'])
 
 
 class GameBoard:
     """
-    Class representing an empty gameboard. The Gameboard is a dict of lists, and holds the various pieces in the game.
+    Class representing an empty gameboard. The Gameboard is a flat list of 90 squares addressed by integer square
+    indexes, and holds the various pieces in the game. String locations are still accepted by get_square/set_square.
     This class will not directly call/interact with any other classes, although GamePiece classes will be stored
     in the various squares.
     """
     def __init__(self):
-        """Init GameBoard Class with board and palace information. The board is a dict of lists."""
-        self._board = {x: list('__' for _ in range(10)) for x in ('a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i')}
-        self._blue_palace = ['d10', 'e10', 'f10', 'd9', 'e9', 'f9', 'd8', 'e8', 'f8']
-        self._red_palace = ['d1', 'e1', 'f1', 'd2', 'e2', 'f2', 'd3', 'e3', 'f3']
-        self._blue_diag_palace = ['d10', 'f10', 'e9', 'd8', 'f8']
-        self._red_diag_palace = ['d1', 'f1', 'e2', 'd3', 'f3']
+        """Init GameBoard Class with board and palace information. The board is a list of 90 squares."""
+        self._squares = [EMPTY] * 90
+        # Zobrist key of the pieces on the board, updated incrementally by set_square
+        self._zobrist_key = 0
+        # Material plus piece-square scores, and official points, of each team, indexed by team code. Updated by
+        # set_square for the evaluation
+        self._scores = [0, 0]
+        self._points = [0, 0]
+        # Occupied ranks of each file as a bitmask (bit n is row n + 1), updated by set_square
+        self._file_occupancy = [0] * 9
+        # Optional AttackMap and BitBoard kept up to date by set_square, see JanggiGame.enable_attack_map and
+        # JanggiGame.enable_bitboard
+        self._attack_map = None
+        self._bitboard = None
+        self._blue_palace = list(BLUE_PALACE)
+        self._red_palace = list(RED_PALACE)
+        self._blue_diag_palace = list(BLUE_DIAG_PALACE)
+        self._red_diag_palace = list(RED_DIAG_PALACE)
 
     def get_board(self):
-        """Return the board, which is a dict of lists"""
-        return self._board
+        """Return a snapshot of the board as a dict of lists, keyed by column letter and indexed by row - 1"""
+        return {col: self._squares[index::9] for index, col in enumerate(BOARD_COLUMNS)}
+
+    def get_squares(self):
+        """Return the flat list of 90 squares backing the board. Each square is either a GamePiece or '__'"""
+        return self._squares
 
     def get_palace(self, team):
         """Return list of palace squares for an input team. Palaces squares are string locations"""
@@ -50,22 +77,17 @@ class GameBoard:
         return self._red_diag_palace + self._blue_diag_palace
 
     def display_board(self):
-        """Converts dict of lists to list of lists and prints vertically for accurate display of board in terminal"""
-        display_list = []
-        # Sort key values alphabetically into a list of lists
-        for key, value in sorted(self._board.items()):
-            display_list.append(value)
-
-        # Print out list of lists vertically with column and row markers
+        """Prints the board row by row for accurate display of board in terminal"""
+        # Print out board with column and row markers
         print('   a  b  c  d  e  f  g  h  i')
-        for col in range(10):
-            if col + 1 < 10:
-                print(col + 1, end='  ')
+        for row in range(10):
+            if row + 1 < 10:
+                print(row + 1, end='  ')
             # adjust spacing for double digit row (10)
             else:
-                print(col + 1, end=' ')
-            for row in display_list:
-                print(row[col], end=' ')
+                print(row + 1, end=' ')
+            for square in self._squares[row * 9:row * 9 + 9]:
+                print(square, end=' ')
             print()
 
     def get_square(self, location):
@@ -73,19 +95,98 @@ class GameBoard:
         Return a specific square on the board at location (string input). Return value is either a GamePiece, a
         string "__" denoting an empty square, or None, which represents the out of bounds area
         """
-        col = location[0]
-        row = int(location[1:]) - 1
+        square = SQUARE_INDEX.get(location)
         # if square is off board, return None
-        if row < 0 or row > 9 or col < 'a' or col > 'i':
+        if square is None:
             return None
-        return_square = self._board[col][row]
-        return return_square
+        return self._squares[square]
 
     def set_square(self, location, value):
         """Set square at location (string input) to value (either empty string or gamepiece)"""
-        col = location[0]
-        row = int(location[1:]) - 1
-        self._board[col][row] = value
+        self.set_square_at(SQUARE_INDEX[location], value)
+
+    def get_square_at(self, square):
+        """Return the contents of the square at an integer square index. Either a GamePiece or '__'"""
+        return self._squares[square]
+
+    def set_square_at(self, square, value):
+        """Set the square at an integer square index to value (either '__' or gamepiece)"""
+        old_value = self._squares[square]
+        if old_value is not EMPTY:
+            self._zobrist_key ^= old_value.zobrist_keys[square]
+            self._scores[old_value.team] -= old_value.square_scores[square]
+            self._points[old_value.team] -= old_value.points
+            self._file_occupancy[square % 9] &= ~(1 << square // 9)
+        # Empty squares always hold the same '__' object, so internal code can test them with 'is'
+        if isinstance(value, str):
+            value = EMPTY
+        else:
+            self._zobrist_key ^= value.zobrist_keys[square]
+            self._scores[value.team] += value.square_scores[square]
+            self._points[value.team] += value.points
+            self._file_occupancy[square % 9] |= 1 << square // 9
+        self._squares[square] = value
+        if self._attack_map is not None:
+            self._attack_map.update_square(square)
+        if self._bitboard is not None:
+            if value is EMPTY:
+                self._bitboard.remove_piece(square)
+            else:
+                self._bitboard.set_piece(square, value.team, value.kind)
+
+    def get_attack_map(self):
+        """Return the AttackMap attached to the board, or None"""
+        return self._attack_map
+
+    def set_attack_map(self, attack_map):
+        """Attach an AttackMap (or None) to the board, to be updated on every change of a square"""
+        self._attack_map = attack_map
+
+    def get_bitboard(self):
+        """Return the BitBoard attached to the board, or None"""
+        return self._bitboard
+
+    def set_bitboard(self, bitboard):
+        """Attach a BitBoard (or None) holding the same pieces to the board, updated on every change of a square"""
+        self._bitboard = bitboard
+
+    def get_file_occupancy(self, file):
+        """Return bitmask of the occupied rows of a file (column index 0-8), bit n is set if row n + 1 is occupied"""
+        return self._file_occupancy[file]
+
+    def count_between_on_file(self, square_a, square_b):
+        """Return the number of pieces strictly between two square indexes on the same file"""
+        low_row, high_row = sorted((square_a // 9, square_b // 9))
+        between = self._file_occupancy[square_a % 9] & ((1 << high_row) - (2 << low_row))
+        return bin(between).count('1')
+
+    def get_zobrist_key(self):
+        """Return the 64 bit Zobrist key of the pieces on the board"""
+        return self._zobrist_key
+
+    def get_scores(self):
+        """Return (red, blue) material plus piece-square scores of the pieces on the board, see JanggiEval"""
+        return self._scores[0], self._scores[1]
+
+    def get_points(self):
+        """Return (red, blue) official point values of the pieces on the board, without the deom"""
+        return self._points[0], self._points[1]
+
+    def compute_scores(self):
+        """Recompute the (red, blue) scores from scratch. Used to verify the incremental scores"""
+        scores = [0, 0]
+        for square, value in enumerate(self._squares):
+            if value is not EMPTY:
+                scores[value.team] += PIECE_SQUARE_SCORES[value.team][value.kind][square]
+        return scores[0], scores[1]
+
+    def compute_zobrist_key(self):
+        """Recompute the Zobrist key of the pieces on the board from scratch. Used to verify the incremental key"""
+        zobrist_key = 0
+        for square, value in enumerate(self._squares):
+            if value is not EMPTY:
+                zobrist_key ^= ZOBRIST_PIECE_KEYS[value.team][value.kind][square]
+        return zobrist_key
 
 
 class JanggiGame:
@@ -99,8 +200,19 @@ class JanggiGame:
         self._game_state = 'UNFINISHED'
         self._janggi_board = GameBoard()
         self._player_turn = 'blue'
-        self._blue_general = 'e9'
-        self._red_general = 'e2'
+        # General locations are tracked as integer square indexes, indexed by team code
+        self._generals = [SQUARE_INDEX['e2'], SQUARE_INDEX['e9']]
+        # Moves played with push, along with what is needed to take them back with pop
+        self._undo_stack = []
+        # Transposition table and move ordering history kept between auto_move searches, created on first use
+        self._transposition_table = None
+        self._move_orderer = None
+        # ParallelSearcher of auto_move with several workers, created on first use and kept, with its worker processes
+        # and their transposition tables, until close_workers is called
+        self._parallel_searcher = None
+        # GameStatus of the current position and the (Zobrist key, game state) it was computed for, see get_status
+        self._status = None
+        self._status_key = None
 
         # Set up pieces of board - PROBABLY CAN FIGURE OUT A BETTER WAY TO SET THIS UP THAN HARD CODING ALL THIS
         # General
@@ -155,10 +267,54 @@ class JanggiGame:
         """Return instance of GameBoard for the game (aka GameBoard object)"""
         return self._janggi_board
 
+    def set_janggi_board(self, board, player_turn='blue'):
+        """
+        Replace the board with another GameBoard, such as a loaded position, with player_turn to move. The generals
+        are located on the new board, and the move history and game state are reset. If an attack map is enabled, a
+        new one is built for the new board, and likewise a bitboard. Raises ValueError unless each team has exactly one
+        general.
+        """
+        generals = [[], []]
+        for square, value in enumerate(board.get_squares()):
+            if value is not EMPTY and value.kind == GENERAL:
+                generals[value.team].append(square)
+        for team in (RED, BLUE):
+            if len(generals[team]) != 1:
+                raise ValueError('{} must have exactly one general, found {}'.format(TEAMS[team], len(generals[team])))
+        if self._janggi_board.get_attack_map() is not None and board.get_attack_map() is None:
+            board.set_attack_map(AttackMap(board))
+        if self._janggi_board.get_bitboard() is not None and board.get_bitboard() is None:
+            board.set_bitboard(BitBoard.from_game_board(board))
+        self._janggi_board = board
+        self._generals = [generals[RED][0], generals[BLUE][0]]
+        self._player_turn = player_turn
+        self._undo_stack = []
+        self._game_state = 'UNFINISHED'
+
     def get_player_turn(self):
         """Return player turn"""
         return self._player_turn
 
+    def get_status(self):
+        """
+        Return the GameStatus of the current position: player turn, game state, check flags of both teams, squares of
+        the pieces checking the player to move, and number of legal moves of the player to move. Computed once per
+        position and cached. The cache is keyed by the Zobrist key of the position (which includes the side to move)
+        and the game state, so any change made with make_move, push/pop, change_turn, set_game_state or to the board
+        itself invalidates it, and polling an unchanged position is cheap.
+        """
+        status_key = (self.get_zobrist_key(), self._game_state)
+        if status_key != self._status_key:
+            team = TEAM_CODES[self._player_turn]
+            in_check = (self.is_in_check(RED), self.is_in_check(BLUE))
+            checkers = ()
+            if in_check[team]:
+                checkers = tuple(self.get_attackers(self._generals[team], 1 - team))
+            legal_move_count = sum(1 for _ in self.iter_legal_moves())
+            self._status = GameStatus(self._player_turn, self._game_state, in_check, checkers, legal_move_count)
+            self._status_key = status_key
+        return self._status
+
     def change_turn(self):
         """Change player_turn"""
         if self.get_player_turn() == 'blue':
@@ -166,19 +322,26 @@ class JanggiGame:
         else:
             self._player_turn = 'blue'
 
+    def get_zobrist_key(self):
+        """
+        Return the 64 bit Zobrist key of the position, covering piece, team and square of every piece and the side to
+        move. The board part is maintained incrementally by set_square, so this is O(1)
+        """
+        if self._player_turn == 'red':
+            return self._janggi_board.get_zobrist_key() ^ ZOBRIST_RED_TURN_KEY
+        return self._janggi_board.get_zobrist_key()
+
     def change_general_location(self, new_location, team):
         """Update tracking location of general. Used in make_move method. DOES NOT ACTUALLY MOVE GENERAL"""
-        if team == 'blue':
-            self._blue_general = new_location
-        else:
-            self._red_general = new_location
+        self._generals[TEAM_CODES[team]] = SQUARE_INDEX[new_location]
 
     def get_general_loc(self, team):
         """Return location of general for a team"""
-        if team == 'blue':
-            return self._blue_general
-        else:
-            return self._red_general
+        return SQUARE_NAMES[self._generals[TEAM_CODES[team]]]
+
+    def get_general_square(self, team):
+        """Return location of general for a team (string or team code) as an integer square index"""
+        return self._generals[TEAM_CODES[team]]
 
     def get_opposite_team(self):
         """Return the opposite team of the player turn."""
@@ -189,81 +352,382 @@ class JanggiGame:
 
     def are_generals_facing(self):
         """Checks if generals are facing unobstructed and returns True or False"""
-        red_general_column = self._red_general[0]
-        blue_general_column = self._blue_general[0]
-        if red_general_column == blue_general_column:
-            red_general_flag = False
-            intercepting_piece_flag = False
-            # Loop through column of generals, find red general (since red will always come before blue), check if
-            # piece is between red and blue general
-            for val in self._janggi_board.get_board()[red_general_column]:
-                if red_general_flag is True and val != "__" and val.get_type() == "General" and intercepting_piece_flag is False:
-                    return True
-                if red_general_flag is True and val != "__" and val.get_type() != "General":
-                    intercepting_piece_flag = True
-                if val != "__" and val.get_type() == "General" and val.get_team() == 'red':
-                    red_general_flag = True
+        red_general, blue_general = self._generals
+        if red_general % 9 == blue_general % 9:
+            # Check if any piece is between red and blue general, using the occupied rows of their file
+            if self._janggi_board.count_between_on_file(red_general, blue_general):
+                return False
+            return True
         return False
 
+    def get_enemy_move_squares(self, team):
+        """
+        Return set of all square indexes the pieces of the team opposing the input team can move to. Answered from the
+        bitboard if enabled.
+        """
+        enemy_move_set = set()
+        board = self._janggi_board
+        team = TEAM_CODES[team]
+        if board.get_bitboard() is not None:
+            return set(mask_to_squares(board.get_bitboard().movable_squares(1 - team)))
+        for square, value in enumerate(board.get_squares()):
+            if value is not EMPTY and value.team != team:
+                enemy_move_set.update(value.destinations(square, board))
+
+        return enemy_move_set
+
     def get_all_enemy_moves(self, team):
         """
         Determine all possible moves of enemy. Used for check/mate logic. Returns set of all move locations for
         opposing team input. Team input should be a string, 'blue' or 'red'
         """
-        enemy_move_set = set()
-        for key, value in self._janggi_board.get_board().items():
-            row = 1
-            for square in value:
-                if square != "__" and square.get_team() != team:
-                    location = key + str(row)
-                    moves = square.valid_moves(location, self.get_janggi_board())
-                    enemy_move_set.update(moves)
-                row += 1
+        return set(SQUARE_NAMES[square] for square in self.get_enemy_move_squares(team))
 
-        return enemy_move_set
+    def is_square_attacked(self, square, by_team):
+        """
+        Return True if any piece of by_team (string or team code) could move onto square (integer index or string
+        location), otherwise False. Works backwards from the target square instead of generating every enemy move:
+        chariot and cannon rays along files, ranks and palace diagonals, horse and elephant origin squares with their
+        legs, and soldier and general/guard adjacency. The contents of square are ignored, except that a cannon never
+        attacks a cannon.
+        """
+        if isinstance(square, str):
+            square = SQUARE_INDEX[square]
+        by_team = TEAM_CODES[by_team]
+        board = self._janggi_board
+        if board.get_attack_map() is not None:
+            return board.get_attack_map().is_square_attacked(square, by_team)
+        squares = board.get_squares()
+
+        # Horses and elephants, attack if their leg squares are empty
+        for origin, leg in HORSE_ATTACKS[square]:
+            value = squares[origin]
+            if value is not EMPTY and value.kind == HORSE and value.team == by_team and squares[leg] is EMPTY:
+                return True
+        for origin, leg, second_leg in ELEPHANT_ATTACKS[square]:
+            value = squares[origin]
+            if value is not EMPTY and value.kind == ELEPHANT and value.team == by_team and \
+                    squares[leg] is EMPTY and squares[second_leg] is EMPTY:
+                return True
+
+        # Soldiers, and generals/guards within the palace of by_team
+        for origin in SOLDIER_ATTACKS[by_team][square]:
+            value = squares[origin]
+            if value is not EMPTY and value.kind == SOLDIER and value.team == by_team:
+                return True
+        for origin in PALACE_MOVES[by_team][square]:
+            value = squares[origin]
+            if value is not EMPTY and value.team == by_team and value.kind <= GUARD:
+                return True
+
+        # Chariots and cannons, walk each line outwards from the target
+        target = squares[square]
+        cannon_target = target is not EMPTY and target.kind == CANNON
+        for ray in LINE_RAYS[square]:
+            screen = False
+            for next_square in ray:
+                value = squares[next_square]
+                if value is EMPTY:
+                    continue
+                if not screen:
+                    # First piece on the line: either an attacking chariot, or the screen for a cannon
+                    if value.kind == CHARIOT and value.team == by_team:
+                        return True
+                    # cannons cannot jump other cannons
+                    if value.kind == CANNON or cannon_target:
+                        break
+                    screen = True
+                else:
+                    # Second piece on the line: an attacking cannon jumping the screen
+                    if value.kind == CANNON and value.team == by_team:
+                        return True
+                    break
+
+        return False
+
+    def get_attackers(self, square, by_team):
+        """
+        Return list of the squares of every piece of by_team (string or team code) that could move onto square
+        (integer index or string location). Uses the same reverse lookups as is_square_attacked, but finds all
+        attackers instead of stopping at the first.
+        """
+        if isinstance(square, str):
+            square = SQUARE_INDEX[square]
+        by_team = TEAM_CODES[by_team]
+        squares = self._janggi_board.get_squares()
+        attackers = []
+
+        for origin, leg in HORSE_ATTACKS[square]:
+            value = squares[origin]
+            if value is not EMPTY and value.kind == HORSE and value.team == by_team and squares[leg] is EMPTY:
+                attackers.append(origin)
+        for origin, leg, second_leg in ELEPHANT_ATTACKS[square]:
+            value = squares[origin]
+            if value is not EMPTY and value.kind == ELEPHANT and value.team == by_team and \
+                    squares[leg] is EMPTY and squares[second_leg] is EMPTY:
+                attackers.append(origin)
+        for origin in SOLDIER_ATTACKS[by_team][square]:
+            value = squares[origin]
+            if value is not EMPTY and value.kind == SOLDIER and value.team == by_team:
+                attackers.append(origin)
+        for origin in PALACE_MOVES[by_team][square]:
+            value = squares[origin]
+            if value is not EMPTY and value.team == by_team and value.kind <= GUARD:
+                attackers.append(origin)
+
+        target = squares[square]
+        cannon_target = target is not EMPTY and target.kind == CANNON
+        for ray in LINE_RAYS[square]:
+            screen = False
+            for next_square in ray:
+                value = squares[next_square]
+                if value is EMPTY:
+                    continue
+                if not screen:
+                    if value.kind == CHARIOT and value.team == by_team:
+                        attackers.append(next_square)
+                        # The chariot is also the screen of any cannon behind it
+                        if cannon_target:
+                            break
+                        screen = True
+                        continue
+                    if value.kind == CANNON or cannon_target:
+                        break
+                    screen = True
+                else:
+                    if value.kind == CANNON and value.team == by_team:
+                        attackers.append(next_square)
+                    break
+
+        return attackers
+
+    def enable_attack_map(self):
+        """
+        Start maintaining per team attack counts for every square, updated incrementally as pieces move, and return
+        the AttackMap. While enabled is_square_attacked and is_in_check are answered from the map.
+        """
+        board = self._janggi_board
+        if board.get_attack_map() is None:
+            board.set_attack_map(AttackMap(board))
+        return board.get_attack_map()
+
+    def disable_attack_map(self):
+        """Stop maintaining attack counts"""
+        self._janggi_board.set_attack_map(None)
+
+    def get_attack_map(self):
+        """Return the AttackMap of the game if enabled, otherwise None"""
+        return self._janggi_board.get_attack_map()
+
+    def enable_bitboard(self):
+        """
+        Start keeping a BitBoard of the position in sync with the board as pieces move, and return it. While enabled
+        get_enemy_move_squares and get_all_enemy_moves are answered from the bitboard, and whole board queries such
+        as the squares attacked by a team can be made on it directly.
+        """
+        board = self._janggi_board
+        if board.get_bitboard() is None:
+            board.set_bitboard(BitBoard.from_game_board(board))
+        return board.get_bitboard()
+
+    def disable_bitboard(self):
+        """Stop keeping the bitboard in sync"""
+        self._janggi_board.set_bitboard(None)
+
+    def get_bitboard(self):
+        """Return the BitBoard of the game if enabled, otherwise None"""
+        return self._janggi_board.get_bitboard()
 
     def is_in_check(self, team):
         """If the given team is in check, returns True, otherwise return False"""
-        enemy_move_set = self.get_all_enemy_moves(team)
-        if team == 'blue' and self._blue_general in enemy_move_set:
-            return True
-        elif team == 'red' and self._red_general in enemy_move_set:
-            return True
-        else:
-            return False
+        team = TEAM_CODES[team]
+        return self.is_square_attacked(self._generals[team], 1 - team)
+
+    def get_guard_squares(self, team, in_check=None):
+        """
+        Return set of squares through which the enemy can attack the general of team. If the team is in check, only
+        the lines and legs of the checking pieces are included, so any move that does not touch one of these squares
+        cannot escape check. Otherwise the set holds every line from the general that contains an enemy chariot,
+        cannon or general (pins, cannon screens and the generals facing rule) and the legs of enemy horses and
+        elephants that could reach the general, so any move that does not touch one of these squares cannot expose
+        the general. team can be a string or team code, in_check is computed if not given.
+        """
+        squares = self._janggi_board.get_squares()
+        team = TEAM_CODES[team]
+        general = self._generals[team]
+        enemy_team = 1 - team
+        if in_check is None:
+            in_check = self.is_square_attacked(general, enemy_team)
+        guard_squares = set()
+
+        # Lines from the general, up to the furthest enemy piece that can act along the line
+        for ray in LINE_RAYS[general]:
+            pieces_seen = 0
+            for index, next_square in enumerate(ray):
+                value = squares[next_square]
+                if value is EMPTY:
+                    continue
+                pieces_seen += 1
+                if value.team != enemy_team or value.kind not in (CHARIOT, CANNON, GENERAL):
+                    continue
+                if in_check:
+                    # Only a chariot directly on the line or a cannon with one non cannon screen gives check
+                    if pieces_seen == 1 and value.kind == CHARIOT or \
+                            pieces_seen == 2 and value.kind == CANNON and not any(
+                                squares[screen] is not EMPTY and squares[screen].kind == CANNON
+                                for screen in ray[:index]):
+                        guard_squares.update(ray[:index + 1])
+                else:
+                    guard_squares.update(ray[:index + 1])
+
+        # Horses and elephants, including their origin so captures of a checking piece are considered
+        for origin, leg in HORSE_ATTACKS[general]:
+            value = squares[origin]
+            if value is not EMPTY and value.kind == HORSE and value.team == enemy_team and (
+                    not in_check or squares[leg] is EMPTY):
+                guard_squares.update((origin, leg))
+        for origin, leg, second_leg in ELEPHANT_ATTACKS[general]:
+            value = squares[origin]
+            if value is not EMPTY and value.kind == ELEPHANT and value.team == enemy_team and (
+                    not in_check or squares[leg] is EMPTY and squares[second_leg] is EMPTY):
+                guard_squares.update((origin, leg, second_leg))
+
+        # Soldiers can only be dealt with by capturing them
+        if in_check:
+            for origin in SOLDIER_ATTACKS[enemy_team][general]:
+                value = squares[origin]
+                if value is not EMPTY and value.kind == SOLDIER and value.team == enemy_team:
+                    guard_squares.add(origin)
+
+        return guard_squares
+
+    def is_safe_move(self, from_square, to_square):
+        """
+        Try moving the piece on from_square to to_square (integer indexes) and return True if the mover's general is
+        not left in check and the generals are not left facing. The board is always restored.
+        """
+        team = self._janggi_board.get_square_at(from_square).team
+        self.push((from_square, to_square))
+        safe = not self.is_square_attacked(self._generals[team], 1 - team) and not self.are_generals_facing()
+        self.pop()
+        return safe
+
+    def iter_moves(self, team):
+        """
+        Generator of the moves of every piece of team (string or team code) as (from_square, to_square) tuples,
+        without checking whether the general is left in check. Each piece's moves are only generated when reached.
+        """
+        team = TEAM_CODES[team]
+        board = self._janggi_board
+        for square, piece in enumerate(board.get_squares()):
+            if piece is not EMPTY and piece.team == team:
+                for move in piece.destinations(square, board):
+                    yield square, move
+
+    def iter_evasions(self, team, guard_squares=None):
+        """
+        Generator of the only moves that can get team (string or team code) out of check, as (from_square, to_square)
+        tuples, without verifying them: general moves first, then captures on the check lines and legs (taking the
+        checking piece), then interpositions and moves of cannon screens off the check lines. guard_squares is
+        computed if not given. Must only be used while team is in check.
+        """
+        team = TEAM_CODES[team]
+        board = self._janggi_board
+        squares = board.get_squares()
+        general = self._generals[team]
+        if guard_squares is None:
+            guard_squares = self.get_guard_squares(team, True)
+
+        for move in squares[general].destinations(general, board):
+            yield general, move
+
+        # Captures are tried as they are found, the quieter blocking moves are kept for last
+        blocks = []
+        for square, piece in enumerate(squares):
+            if piece is EMPTY or piece.team != team or square == general:
+                continue
+            screen = square in guard_squares
+            for move in piece.destinations(square, board):
+                if move in guard_squares and squares[move] is not EMPTY:
+                    yield square, move
+                elif screen or move in guard_squares:
+                    blocks.append((square, move))
+        yield from blocks
+
+    def iter_legal_moves(self, team=None):
+        """
+        Generator of fully legal moves for team (defaults to the player turn) as (from_square, to_square) tuples of
+        integer square indexes. Moves that cannot affect any line or leg towards the general are accepted or rejected
+        straight away, only the rest are played out and verified. team can be a string or team code.
+        """
+        if team is None:
+            team = self._player_turn
+        team = TEAM_CODES[team]
+        board = self._janggi_board
+        general = self._generals[team]
+        in_check = self.is_square_attacked(general, 1 - team)
+        guard_squares = self.get_guard_squares(team, in_check)
+        for square, piece in enumerate(board.get_squares()):
+            if piece is not EMPTY and piece.team == team:
+                check_all = square == general or square in guard_squares
+                for move in piece.destinations(square, board):
+                    if check_all or move in guard_squares:
+                        if self.is_safe_move(square, move):
+                            yield square, move
+                    elif not in_check:
+                        yield square, move
+
+    def legal_moves(self, team=None):
+        """
+        Return list of fully legal moves for team (defaults to the player turn) as (from_square, to_square) tuples of
+        integer square indexes. team can be a string or team code.
+        """
+        return list(self.iter_legal_moves(team))
+
+    def legal_moves_from(self, square):
+        """
+        Return list of squares the piece on square (integer index or string location) can legally move to. Returns an
+        empty list for an empty or off board square
+        """
+        if isinstance(square, str):
+            square = SQUARE_INDEX.get(square)
+            if square is None:
+                return []
+        board = self._janggi_board
+        piece = board.get_square_at(square)
+        if piece is EMPTY:
+            return []
+        team = piece.team
+        in_check = self.is_square_attacked(self._generals[team], 1 - team)
+        guard_squares = self.get_guard_squares(team, in_check)
+        check_all = square == self._generals[team] or square in guard_squares
+        moves = []
+        for move in piece.destinations(square, board):
+            if check_all or move in guard_squares:
+                if self.is_safe_move(square, move):
+                    moves.append(move)
+            elif not in_check:
+                moves.append(move)
+        return moves
 
     def is_in_checkmate(self, team):
         """If a given team is in checkmate, returns True, otherwise returns False"""
-        # loop through board. for each ally piece, get moves, try move, check if still in check. if no, revert move
-        # and return false. if yes, revert move and continue to next move
-        # Loop through key, value of board
-        for key, value in self._janggi_board.get_board().items():
-            # Keep track of row index
-            row = 1
-            # square is either "__" or a gamepiece
-            for square in value:
-                if square != "__" and square.get_team() == team:
-                    location = key + str(row)
-                    moves = square.valid_moves(location, self.get_janggi_board())
-                    # Loop through all moves for a gamepiece
-                    for move in moves:
-                        # Record contents of move location for roll back
-                        new_square_value = self.get_janggi_board().get_square(move)
-                        # Move gamepiece to new move location
-                        self.get_janggi_board().set_square(move, square)
-                        if square.get_type() == "General":
-                            self.change_general_location(move, team)
-                        # Check if still in check
-                        check_value = self.is_in_check(team)
-                        # Roll back move
-                        self.get_janggi_board().set_square(move, new_square_value)
-                        self.get_janggi_board().set_square(location, square)
-                        if square.get_type() == "General":
-                            self.change_general_location(location, team)
-                        if check_value is False:
-                            # If not in check, team is not in checkmate. return False
-                            return False
-                row += 1
+        # Try candidate moves one at a time, and return False at the first one that leaves team out of check. While
+        # in check only general moves, captures and blocks on the check lines can help, so only those are tried
+        team = TEAM_CODES[team]
+        enemy_team = 1 - team
+        if self.is_square_attacked(self._generals[team], enemy_team):
+            candidates = self.iter_evasions(team)
+        else:
+            candidates = self.iter_moves(team)
+        for move in candidates:
+            # Try move, check if still in check, and roll back move
+            self.push(move)
+            check_value = self.is_square_attacked(self._generals[team], enemy_team)
+            self.pop()
+            if check_value is False:
+                # If not in check, team is not in checkmate. return False
+                return False
 
         # If every move still leaves team in check, team is in check mate, return True
         return True
@@ -273,12 +737,6 @@ class JanggiGame:
         Move a piece from location a to location b. Locations are string inputs. Returns False if move is invalid
         but otherwise moves piece, updates gamestate/player turn and returns true.
         """
-        # get value at location_a and location_b, and location of general
-        # the latter two are used to roll the game back if necessary
-        from_square = self._janggi_board.get_square(location_a)
-        to_square = self._janggi_board.get_square(location_b)
-        general_location = self.get_general_loc(self.get_player_turn())
-
         # Pass turn if location_a and location_b are the same, and the player isn't in check
         # IN ORIGINAL SPECS THIS WAS USED TO PASS TURN
         # USING PYGAME, BUTTON IS CREATED TO PASS TURN, FEEDING SAME LOCATION WILL JUST RESET MOVE
@@ -289,52 +747,90 @@ class JanggiGame:
         if location_a == location_b:
             return False
 
+        # Convert string locations to square indexes, locations off the board are invalid
+        square_a = SQUARE_INDEX.get(location_a)
+        square_b = SQUARE_INDEX.get(location_b)
+        if square_a is None or square_b is None:
+            return False
+
         # Check for validity of move
-        # Check that location_a is in game bounds, there is a friendly unit there, and game isn't over
-        elif from_square == '__' or from_square is None or from_square.get_team() != self._player_turn or self._game_state != 'UNFINISHED':
+        # Check that location_a has a friendly unit, and game isn't over
+        board = self._janggi_board
+        from_square = board.get_square_at(square_a)
+        team = self._player_turn
+        if from_square is EMPTY or from_square.get_team() != team or self._game_state != 'UNFINISHED':
             return False
         # check that location_b is in valid moves for unit at location_a
-        elif location_b not in from_square.valid_moves(location_a, self.get_janggi_board()):
+        elif square_b not in from_square.destinations(square_a, board):
+            return False
+
+        # Move piece. The move is recorded on the undo stack, so it can be rolled back with pop
+        self.push((square_a, square_b))
+
+        # Insure that player does not end their turn in check or with generals facing
+        # If the player does end their turn in check, we need to roll the move back and return False
+        # A player ends their turn in check if they move into check (invalid) or do not move out of check if placed
+        # into it by the enemy in the previous turn
+        # We make the move first so that we can check all enemy moves after player move, as player move can effect
+        # enemy move possibilities
+        if self.is_in_check(team) or self.are_generals_facing():
+            self.pop()
             return False
-        else:
-            # Move piece, set old square to empty string
-            # Also update location of general if general moved
-            if from_square.get_type() == "General":
-                self.change_general_location(location_b, self.get_player_turn())
-            self._janggi_board.set_square(location_b, from_square)
-            self._janggi_board.set_square(location_a, "__")
-
-            # Insure that player does not end their turn in check or with generals facing
-            # If the player does end their turn in check, we need to roll the move back and return False
-            # A player ends their turn in check if they move into check (invalid) or do not move out of check if placed
-            # into it by the enemy in the previous turn
-            # We make the move first so that we can check all enemy moves after player move, as player move can effect
-            # enemy move possibilities
-            player_in_check_after_move = self.is_in_check(self._player_turn)
-            generals_facing = self.are_generals_facing()
-            if player_in_check_after_move is True or generals_facing is True:
-                if from_square.get_type() == "General":
-                    self.change_general_location(general_location, self.get_player_turn())
-                self._janggi_board.set_square(location_b, to_square)
-                self._janggi_board.set_square(location_a, from_square)
-                return False
 
         # If move put opposing player in check, check for check mate
-        # If check mate found, update game state and return True
-        opposing_player_in_check = self.is_in_check(self.get_opposite_team())
-        if opposing_player_in_check is True:
-            opposing_player_in_checkmate = self.is_in_checkmate(self.get_opposite_team())
-            if opposing_player_in_checkmate is True:
-                if self.get_player_turn() == 'red':
-                    self.set_game_state('RED_WON')
-                else:
-                    self.set_game_state('BLUE_WON')
-                return True
+        # If check mate found, update game state and return True. The turn stays with the winning player
+        enemy_team = 1 - TEAM_CODES[team]
+        if self.is_in_check(enemy_team) and self.is_in_checkmate(enemy_team):
+            self._player_turn = team
+            if team == 'red':
+                self.set_game_state('RED_WON')
+            else:
+                self.set_game_state('BLUE_WON')
 
-        # Change the turn and return True to end turn
-        self.change_turn()
+        # push already changed the turn, return True to end turn
         return True
 
+    def push(self, move):
+        """
+        Play move, a (from_square, to_square) tuple of integer square indexes, or None to pass, and change the turn.
+        There is NO validation of the move. Captured piece, general location, turn and game state are recorded on the
+        undo stack so the move can be taken back with pop.
+        """
+        if move is None:
+            self._undo_stack.append((None, None, None, None, self._player_turn, self._game_state))
+            self.change_turn()
+            return
+        from_square, to_square = move
+        board = self._janggi_board
+        piece = board.get_square_at(from_square)
+        captured = board.get_square_at(to_square)
+        team = piece.team
+        self._undo_stack.append((move, captured, team, self._generals[team], self._player_turn, self._game_state))
+
+        board.set_square_at(to_square, piece)
+        board.set_square_at(from_square, EMPTY)
+        if piece.kind == GENERAL:
+            self._generals[team] = to_square
+        self.change_turn()
+
+    def pop(self):
+        """Take back the last move played with push (or make_move) and return it. Returns None for a pass"""
+        move, captured, team, general_location, player_turn, game_state = self._undo_stack.pop()
+        self._player_turn = player_turn
+        self._game_state = game_state
+        if move is None:
+            return None
+        from_square, to_square = move
+        board = self._janggi_board
+        board.set_square_at(from_square, board.get_square_at(to_square))
+        board.set_square_at(to_square, captured)
+        self._generals[team] = general_location
+        return move
+
+    def get_move_history(self):
+        """Return list of moves played with push or make_move, oldest first, as (from_square, to_square) tuples"""
+        return [entry[0] for entry in self._undo_stack]
+
     def swap_horse_elephant(self, team, side):
         """
         For a team, takes either 'both', 'left', 'right', 'neither' as side arguments. Swap elephant and horse for chosen
@@ -373,51 +869,102 @@ class JanggiGame:
                 self._janggi_board.set_square('g1', Horse('red'))
                 self._janggi_board.set_square('h1', Elephant('red'))
 
-    def auto_move(self, team):
+    def auto_move(self, team, time_limit=1.0, node_limit=None, max_depth=64, workers=1):
         """
-        VERY rudimentary AI. Simply loops through  all possible moves, and makes a capture if possible, otherwise randomly moves piece
+        AI move choice. Runs an iterative deepening alpha-beta search for team within the time_limit (seconds) and/or
+        node_limit budget. With more than one worker the root moves are searched in parallel worker processes (see
+        JanggiParallel.py), and node_limit is only checked between iterations. The worker processes are started on the
+        first such call and kept for later moves, call close_workers to shut them down. Returns the best legal move
+        found as [from_location, to_location], or None if team has no legal moves and has to pass.
         """
-        # define value of pieces
-        piece_point_dict = {'General': 900, 'Guard': 20, 'Horse': 50, 'Elephant': 50, 'Chariot': 90, 'Cannon': 50, 'Soldier': 10}
-
-        max_point = 0
-        max_move = None
-        move_list = []
+        if self._transposition_table is None:
+            self._transposition_table = TranspositionTable()
+            self._move_orderer = MoveOrderer()
+
+        # The search is always from the point of view of the player to move. The attack map and bitboard cost more to
+        # update on every trial move than they save, so they are detached while searching. The search restores the
+        # position, so they are still valid afterwards
+        board = self._janggi_board
+        attack_map = board.get_attack_map()
+        bitboard = board.get_bitboard()
+        board.set_attack_map(None)
+        board.set_bitboard(None)
+        passed = team != self._player_turn
+        if passed:
+            self.push(None)
+        try:
+            if workers > 1:
+                # Imported here, as JanggiParallel builds on this module
+                from JanggiParallel import ParallelSearcher
+                if self._parallel_searcher is not None and self._parallel_searcher.get_workers() != workers:
+                    self.close_workers()
+                if self._parallel_searcher is None:
+                    self._parallel_searcher = ParallelSearcher(self, workers)
+                result = self._parallel_searcher.search(max_depth, node_limit, time_limit)
+            else:
+                result = Searcher(self, self._transposition_table, move_orderer=self._move_orderer).search(
+                    max_depth, node_limit, time_limit)
+        finally:
+            if passed:
+                self.pop()
+            board.set_attack_map(attack_map)
+            board.set_bitboard(bitboard)
+
+        if result.move is None:
+            return None
+        return [SQUARE_NAMES[result.move[0]], SQUARE_NAMES[result.move[1]]]
 
-        # Loop through key, value of board
-        for key, value in self._janggi_board.get_board().items():
-            # Keep track of row index
-            row = 1
-            # square is either "__" or a gamepiece
-            for square in value:
-                if square != "__" and square.get_team() == team:
-                    location = key + str(row)
-                    moves = square.valid_moves(location, self.get_janggi_board())
-                    # Loop through all moves for a gamepiece
-                    for move in moves:
-                        move_list.append([location, move])
-                        move_square = self.get_janggi_board().get_square(move)
-                        if move_square != "__" and piece_point_dict[move_square.get_type()] > max_point:
-                            max_point = piece_point_dict[move_square.get_type()]
-                            max_move = [location, move]
-                row += 1
-
-        if max_point > 0:
-            return max_move
-        else:
-            return random.choice(move_list)
+    def close_workers(self):
+        """Shut down the worker processes of parallel auto_move searches, if any"""
+        if self._parallel_searcher is not None:
+            self._parallel_searcher.close()
+            self._parallel_searcher = None
 
 
 class GamePiece:
     """
     Parent GamePiece class, tracks the team and type of a piece. Is inherited by various classes representing the unique
-    pieces of Janggi. The child classes will contain the method valid_moves, which will list all spaces that a piece
-    can move to legally.
+    pieces of Janggi. The child classes will contain the method destinations, which will list all squares that a piece
+    can move to legally, as integer square indexes.
+
+    Pieces are immutable flyweights: there is a single shared instance per team and piece type, so General('red')
+    always returns the same object. Internal code reads the small int codes in the team and kind attributes directly,
+    get_team and get_type return the team and type strings. Each piece also holds its rows of the Zobrist key and
+    evaluation tables, and its official point value, for the incremental updates in GameBoard.set_square_at.
     """
-    def __init__(self, team):
-        """Initialize GamePiece object with team (string) of piece and a piece type"""
-        self._team = team
-        self._type = None
+    __slots__ = ('_team', 'team', 'zobrist_keys', 'square_scores', 'points')
+    _type = None
+    kind = None
+    _symbol = None
+    _instances = {}
+
+    def __new__(cls, team):
+        """Return the shared GamePiece object for the piece class and team (string or team code)"""
+        team_code = TEAM_CODES[team]
+        piece = GamePiece._instances.get((cls, team_code))
+        if piece is None:
+            piece = object.__new__(cls)
+            object.__setattr__(piece, '_team', TEAMS[team_code])
+            object.__setattr__(piece, 'team', team_code)
+            object.__setattr__(piece, 'zobrist_keys', ZOBRIST_PIECE_KEYS[team_code][cls.kind])
+            object.__setattr__(piece, 'square_scores', PIECE_SQUARE_SCORES[team_code][cls.kind])
+            object.__setattr__(piece, 'points', POINT_VALUES[cls.kind])
+            GamePiece._instances[cls, team_code] = piece
+        return piece
+
+    def __setattr__(self, name, value):
+        """GamePiece objects are shared, so they cannot be changed"""
+        raise AttributeError('GamePiece objects are immutable')
+
+    def __reduce__(self):
+        """Pickle as a call to the piece class, so unpickling returns the shared instance"""
+        return type(self), (self._team,)
+
+    def __str__(self):
+        """Override print method to display gamepiece in terminal, in the color of its team"""
+        # termcolor is only needed to display the board, so headless users don't import it
+        from termcolor import colored
+        return colored(self._symbol, self._team)
 
     def get_team(self):
         """Return team of GamePiece"""
@@ -427,318 +974,123 @@ class GamePiece:
         """Return type of GamePiece"""
         return self._type
 
+    def valid_moves(self, location, gameboard):
+        """
+        Determines valid moves for the piece, given the starting location (string), and the state of the gameboard.
+        Returns a set of string locations
+        """
+        return set(SQUARE_NAMES[move] for move in self.destinations(SQUARE_INDEX[location], gameboard))
+
+    def destinations(self, square, gameboard):
+        """Return list of square indexes the piece can move to from square. Implemented by the child classes"""
+        raise NotImplementedError
+
 
 class General(GamePiece):
     """
     General Class. Can move 1 space in any direction within the palace.
     """
-    def __init__(self, team):
-        """Init General with new type"""
-        super().__init__(team)
-        self._type = "General"
+    __slots__ = ()
+    _type = "General"
+    kind = GENERAL
+    _symbol = "GN"
 
-    def __str__(self):
-        """Override print method to display gamepiece in terminal"""
-        return colored("GN", self._team)
-
-    def valid_moves(self, location, gameboard):
-        """Determines valid moves for the piece, given the starting location, and the state of the gameboard"""
-        move_list = []
-        starting_col = location[0]
-        starting_row = int(location[1:])
-        palace_squares = gameboard.get_palace(self.get_team())
-        palace_diag_squares = gameboard.get_team_diag_palace(self.get_team())
-
-        # Create initial 9 possible moves
-        for row_delta in [-1, 0, 1]:
-            for col_delta in [-1, 0, 1]:
-                move_location = chr(ord(starting_col) + col_delta) + str(starting_row + row_delta)
-                # move must be in palace and square must be empty not occupied by enemy
-                if move_location in palace_squares and (
-                        gameboard.get_square(move_location) == '__' or
-                        gameboard.get_square(move_location).get_team() != self.get_team()):
-                    # diagonal moves must by from diagonally connect palace squares
-                    if abs(row_delta) + abs(col_delta) == 2:
-                        if location in palace_diag_squares:
-                            move_list.append(chr(ord(starting_col) + col_delta) + str(starting_row + row_delta))
-                    else:
-                        move_list.append(chr(ord(starting_col) + col_delta) + str(starting_row + row_delta))
-
-        return set(move_list)
+    def destinations(self, square, gameboard):
+        """Determines valid moves for the piece, given the starting square, and the state of the gameboard"""
+        squares = gameboard.get_squares()
+        team = self.team
+        # move must be in palace (diagonal moves only from diagonally connected squares) and square must be empty
+        # or occupied by enemy
+        return [move for move in PALACE_MOVES[team][square]
+                if squares[move] is EMPTY or squares[move].team != team]
 
 
 class Guard(GamePiece):
     """
     Guard Clas. Can move 1 space in any direction within the palace.
     """
-    def __init__(self, team):
-        """Init Guard with new type"""
-        super().__init__(team)
-        self._type = "Guard"
+    __slots__ = ()
+    _type = "Guard"
+    kind = GUARD
+    _symbol = "GD"
 
-    def __str__(self):
-        """Override print method to display gamepiece in terminal"""
-        return colored("GD", self._team)
-
-    def valid_moves(self, location, gameboard):
-        """Determines valid moves for the piece, given the starting location, and the state of the gameboard"""
-        move_list = []
-        starting_col = location[0]
-        starting_row = int(location[1:])
-        palace_squares = gameboard.get_palace(self.get_team())
-        palace_diag_squares = gameboard.get_team_diag_palace(self.get_team())
-
-        # Create initial 9 possible moves
-        for row_delta in [-1, 0, 1]:
-            for col_delta in [-1, 0, 1]:
-                move_location = chr(ord(starting_col) + col_delta) + str(starting_row + row_delta)
-                # move must be in palace and square must be empty not occupied by enemy
-                if move_location in palace_squares and (
-                        gameboard.get_square(move_location) == '__' or
-                        gameboard.get_square(move_location).get_team() != self.get_team()):
-                    # diagonal moves must by from diagonally connect palace squares
-                    if abs(row_delta) + abs(col_delta) == 2:
-                        if location in palace_diag_squares:
-                            move_list.append(chr(ord(starting_col) + col_delta) + str(starting_row + row_delta))
-                    else:
-                        move_list.append(chr(ord(starting_col) + col_delta) + str(starting_row + row_delta))
-
-        return set(move_list)
+    def destinations(self, square, gameboard):
+        """Determines valid moves for the piece, given the starting square, and the state of the gameboard"""
+        squares = gameboard.get_squares()
+        team = self.team
+        # move must be in palace (diagonal moves only from diagonally connected squares) and square must be empty
+        # or occupied by enemy
+        return [move for move in PALACE_MOVES[team][square]
+                if squares[move] is EMPTY or squares[move].team != team]
 
 
 class Horse(GamePiece):
     """
     Horse Class. Can move one step orthogonally and one step diagonally outward. Cannot jump units.
     """
-    def __init__(self, team):
-        """Init Horse with new type"""
-        super().__init__(team)
-        self._type = "Horse"
+    __slots__ = ()
+    _type = "Horse"
+    kind = HORSE
+    _symbol = "HS"
 
-    def __str__(self):
-        """Override print method to display gamepiece in terminal"""
-        return colored("HS", self._team)
-
-    def valid_moves(self, location, gameboard):
-        """Determines valid moves for the piece, given the starting location, and the state of the gameboard"""
-        move_list = []
-        starting_col = location[0]
-        starting_row = int(location[1:])
-
-        # Create 8 possible moves
-        # Test if orthogonal square is empty, then test if diagonal square is empty or enemy occupied
-        # Right
-        if gameboard.get_square(chr(ord(starting_col) + 1) + str(starting_row)) == '__':
-            move_1 = chr(ord(starting_col) + 2) + str(starting_row + 1)
-            move_2 = chr(ord(starting_col) + 2) + str(starting_row - 1)
-            if gameboard.get_square(move_1) is not None and (
-                    gameboard.get_square(move_1) == '__' or
-                    gameboard.get_square(move_1).get_team() != self.get_team()):
-                move_list.append(move_1)
-            if gameboard.get_square(move_2) is not None and (
-                    gameboard.get_square(move_2) == '__' or
-                    gameboard.get_square(move_2).get_team() != self.get_team()):
-                move_list.append(move_2)
-
-        # Left
-        if gameboard.get_square(chr(ord(starting_col) - 1) + str(starting_row)) == '__':
-            move_1 = chr(ord(starting_col) - 2) + str(starting_row + 1)
-            move_2 = chr(ord(starting_col) - 2) + str(starting_row - 1)
-            if gameboard.get_square(move_1) is not None and (
-                    gameboard.get_square(move_1) == '__' or
-                    gameboard.get_square(move_1).get_team() != self.get_team()):
-                move_list.append(move_1)
-            if gameboard.get_square(move_2) is not None and (
-                    gameboard.get_square(move_2) == '__' or
-                    gameboard.get_square(move_2).get_team() != self.get_team()):
-                move_list.append(move_2)
-
-        # Up
-        if gameboard.get_square(chr(ord(starting_col)) + str(starting_row + 1)) == '__':
-            move_1 = chr(ord(starting_col) + 1) + str(starting_row + 2)
-            move_2 = chr(ord(starting_col) - 1) + str(starting_row + 2)
-            if gameboard.get_square(move_1) is not None and (
-                    gameboard.get_square(move_1) == '__' or
-                    gameboard.get_square(move_1).get_team() != self.get_team()):
-                move_list.append(move_1)
-            if gameboard.get_square(move_2) is not None and (
-                    gameboard.get_square(move_2) == '__' or
-                    gameboard.get_square(move_2).get_team() != self.get_team()):
-                move_list.append(move_2)
-
-        # Down
-        if gameboard.get_square(chr(ord(starting_col)) + str(starting_row - 1)) == '__':
-            move_1 = chr(ord(starting_col) + 1) + str(starting_row - 2)
-            move_2 = chr(ord(starting_col) - 1) + str(starting_row - 2)
-            if gameboard.get_square(move_1) is not None and (
-                    gameboard.get_square(move_1) == '__' or
-                    gameboard.get_square(move_1).get_team() != self.get_team()):
-                move_list.append(move_1)
-            if gameboard.get_square(move_2) is not None and (
-                    gameboard.get_square(move_2) == '__' or
-                    gameboard.get_square(move_2).get_team() != self.get_team()):
-                move_list.append(move_2)
-
-        return set(move_list)
+    def destinations(self, square, gameboard):
+        """Determines valid moves for the piece, given the starting square, and the state of the gameboard"""
+        squares = gameboard.get_squares()
+        team = self.team
+        # Test if orthogonal leg square is empty, then test if destination is empty or enemy occupied
+        return [move for leg, move in HORSE_MOVES[square]
+                if squares[leg] is EMPTY and (squares[move] is EMPTY or squares[move].team != team)]
 
 
 class Elephant(GamePiece):
     """
     Elephant Class. Moves one step orthogonally and then two steps diagonally outwards. Cannot jump pieces.
     """
-    def __init__(self, team):
-        """Init Elephant with new type"""
-        super().__init__(team)
-        self._type = "Elephant"
-
-    def __str__(self):
-        """Override print method to display gamepiece in terminal"""
-        return colored("EL", self._team)
+    __slots__ = ()
+    _type = "Elephant"
+    kind = ELEPHANT
+    _symbol = "EL"
 
-    def valid_moves(self, location, gameboard):
-        """Determines valid moves for the piece, given the starting location, and the state of the gameboard"""
-        move_list = []
-        starting_col = location[0]
-        starting_row = int(location[1:])
-
-        # Create 8 possible moves
-        # Test if orthogonal square is empty, then test if diagonal square is empty or enemy occupied
-        # Nested if statements walk through movement to insure no piece is blocking path
-        # Movement is one step orthogonally, then one step diagonally out, then one more step diagonally out
-        # Right
-        if gameboard.get_square(chr(ord(starting_col) + 1) + str(starting_row)) == '__':
-            if gameboard.get_square(chr(ord(starting_col) + 2) + str(starting_row + 1)) == '__':
-                move = chr(ord(starting_col) + 3) + str(starting_row + 2)
-                if gameboard.get_square(move) is not None and (
-                        gameboard.get_square(move) == '__' or
-                        gameboard.get_square(move).get_team() != self.get_team()):
-                    move_list.append(move)
-            if gameboard.get_square(chr(ord(starting_col) + 2) + str(starting_row - 1)) == '__':
-                move = chr(ord(starting_col) + 3) + str(starting_row - 2)
-                if gameboard.get_square(move) is not None and (
-                        gameboard.get_square(move) == '__' or
-                        gameboard.get_square(move).get_team() != self.get_team()):
-                    move_list.append(move)
-
-        # Left
-        if gameboard.get_square(chr(ord(starting_col) - 1) + str(starting_row)) == '__':
-            if gameboard.get_square(chr(ord(starting_col) - 2) + str(starting_row + 1)) == '__':
-                move = chr(ord(starting_col) - 3) + str(starting_row + 2)
-                if gameboard.get_square(move) is not None and (
-                        gameboard.get_square(move) == '__' or
-                        gameboard.get_square(move).get_team() != self.get_team()):
-                    move_list.append(move)
-            if gameboard.get_square(chr(ord(starting_col) - 2) + str(starting_row - 1)) == '__':
-                move = chr(ord(starting_col) - 3) + str(starting_row - 2)
-                if gameboard.get_square(move) is not None and (
-                        gameboard.get_square(move) == '__' or
-                        gameboard.get_square(move).get_team() != self.get_team()):
-                    move_list.append(move)
-
-        # Up
-        if gameboard.get_square(chr(ord(starting_col)) + str(starting_row + 1)) == '__':
-            if gameboard.get_square(chr(ord(starting_col) + 1) + str(starting_row + 2)) == '__':
-                move = chr(ord(starting_col) + 2) + str(starting_row + 3)
-                if gameboard.get_square(move) is not None and (
-                        gameboard.get_square(move) == '__' or
-                        gameboard.get_square(move).get_team() != self.get_team()):
-                    move_list.append(move)
-            if gameboard.get_square(chr(ord(starting_col) - 1) + str(starting_row + 2)) == '__':
-                move = chr(ord(starting_col) - 2) + str(starting_row + 3)
-                if gameboard.get_square(move) is not None and (
-                        gameboard.get_square(move) == '__' or
-                        gameboard.get_square(move).get_team() != self.get_team()):
-                    move_list.append(move)
-
-        # Down
-        if gameboard.get_square(chr(ord(starting_col)) + str(starting_row - 1)) == '__':
-            if gameboard.get_square(chr(ord(starting_col) + 1) + str(starting_row - 2)) == '__':
-                move = chr(ord(starting_col) + 2) + str(starting_row - 3)
-                if gameboard.get_square(move) is not None and (
-                        gameboard.get_square(move) == '__' or
-                        gameboard.get_square(move).get_team() != self.get_team()):
-                    move_list.append(move)
-            if gameboard.get_square(chr(ord(starting_col) - 1) + str(starting_row - 2)) == '__':
-                move = chr(ord(starting_col) - 2) + str(starting_row - 3)
-                if gameboard.get_square(move) is not None and (
-                        gameboard.get_square(move) == '__' or
-                        gameboard.get_square(move).get_team() != self.get_team()):
-                    move_list.append(move)
-
-        return set(move_list)
+    def destinations(self, square, gameboard):
+        """Determines valid moves for the piece, given the starting square, and the state of the gameboard"""
+        squares = gameboard.get_squares()
+        team = self.team
+        # Test if both leg squares are empty, then test if destination is empty or enemy occupied
+        return [move for leg, second_leg, move in ELEPHANT_MOVES[square]
+                if squares[leg] is EMPTY and squares[second_leg] is EMPTY and (
+                    squares[move] is EMPTY or squares[move].team != team)]
 
 
 class Chariot(GamePiece):
     """
     Chariot Class. Moves in an orthogonal line, and can move diagonally within palace.
     """
-    def __init__(self, team):
-        """Init Chariot with new type"""
-        super().__init__(team)
-        self._type = "Chariot"
+    __slots__ = ()
+    _type = "Chariot"
+    kind = CHARIOT
+    _symbol = "CH"
 
-    def __str__(self):
-        """Override print method to display gamepiece in terminal"""
-        return colored("CH", self._team)
-
-    def valid_moves(self, location, gameboard):
-        """Determines valid moves for the piece, given the starting location, and the state of the gameboard"""
+    def destinations(self, square, gameboard):
+        """Determines valid moves for the piece, given the starting square, and the state of the gameboard"""
         move_list = []
-        starting_col = location[0]
-        starting_row = int(location[1:])
-        palace_squares = gameboard.get_both_palaces()
-        palace_diag_squares = gameboard.get_both_diag_palace()
-
-        # Chariot moves in 4 orthogonal directions while outside palace, and 8 directions inside palace
-        for direction in ['up', 'right', 'down', 'left', 'upright', 'downright', 'downleft', 'upleft']:
-            stop_flag = False
-            last_col = starting_col
-            last_row = starting_row
-            # all moves in a line up to edge of board/ally piece/onto enemy piece are valid
-            # if in palace, can move diagonally to edge of palace as well
-            if direction in ['upright', 'downright', 'downleft', 'upleft'] and location not in palace_diag_squares:
-                # if chariot is not in diagonally connect palace squares, it can't move diagonally
-                stop_flag = True
-            while stop_flag is False:
-                if direction == 'up':
-                    next_location = chr(ord(last_col)) + str(last_row + 1)
-                elif direction == 'right':
-                    next_location = chr(ord(last_col) + 1) + str(last_row)
-                elif direction == 'down':
-                    next_location = chr(ord(last_col)) + str(last_row - 1)
-                elif direction == 'left':
-                    next_location = chr(ord(last_col) - 1) + str(last_row)
-                elif direction == 'upright':
-                    next_location = chr(ord(last_col) + 1) + str(last_row + 1)
-                elif direction == 'downright':
-                    next_location = chr(ord(last_col) + 1) + str(last_row - 1)
-                elif direction == 'downleft':
-                    next_location = chr(ord(last_col) - 1) + str(last_row - 1)
-                else:
-                    next_location = chr(ord(last_col) - 1) + str(last_row + 1)
-                next_square = gameboard.get_square(next_location)
-                # if next square is off board, stop
-                if next_square is None:
-                    stop_flag = True
-                # if moving diagonally, and next square is outside the palace, stop
-                elif direction in ['upright', 'downright', 'downleft',
-                                   'upleft'] and next_location not in palace_squares:
-                    stop_flag = True
+        squares = gameboard.get_squares()
+        team = self.team
+
+        # Chariot moves along 4 orthogonal rays, plus the palace diagonal rays when on a diagonally connected square
+        # all moves in a line up to edge of board/ally piece/onto enemy piece are valid
+        for ray in LINE_RAYS[square]:
+            for next_square in ray:
+                value = squares[next_square]
                 # if next square is empty, can move there
-                elif next_square == '__':
-                    move_list.append(next_location)
-                # if next square is ally, stop
-                elif next_square.get_team() == self.get_team():
-                    stop_flag = True
-                # if next square is enemy, can move there but stop after
-                else:
-                    move_list.append(next_location)
-                    stop_flag = True
-                # advance last col/row info to next square for next iteration
-                last_col = next_location[0]
-                last_row = int(next_location[1:])
+                if value is EMPTY:
+                    move_list.append(next_square)
+                    continue
+                # if next square is enemy, can move there. Stop after ally or enemy
+                if value.team != team:
+                    move_list.append(next_square)
+                break
 
-        return set(move_list)
+        return move_list
 
 
 class Cannon(GamePiece):
@@ -747,147 +1099,64 @@ class Cannon(GamePiece):
     The jumped piece can be friendly or enemy. The jumped piece cannot be another cannon. The cannon cannot capture an
     enemy cannon. The cannon can move diagonally within the palace (like the Chariot)
     """
-    def __init__(self, team):
-        """Init Cannon with new type"""
-        super().__init__(team)
-        self._type = "Cannon"
+    __slots__ = ()
+    _type = "Cannon"
+    kind = CANNON
+    _symbol = "CA"
 
-    def __str__(self):
-        """Override print method to display gamepiece in terminal"""
-        return colored("CA", self._team)
-
-    def valid_moves(self, location, gameboard):
-        """Determines valid moves for the piece, given the starting location, and the state of the gameboard"""
+    def destinations(self, square, gameboard):
+        """Determines valid moves for the piece, given the starting square, and the state of the gameboard"""
         move_list = []
-        starting_col = location[0]
-        starting_row = int(location[1:])
-        palace_squares = gameboard.get_both_palaces()
-        palace_diag_squares = gameboard.get_both_diag_palace()
-
-        # Cannon moves in 4 orthogonal directions while outside palace, and 8 directions inside palace. It must jump a unit
-        for direction in ['up', 'right', 'down', 'left', 'upright', 'downright', 'downleft', 'upleft']:
-            stop_flag = False
-            unit_counter = 0
-            last_col = starting_col
-            last_row = starting_row
-            # all moves in a line up to edge of board/ally piece/onto enemy piece are valid
-            # if in palace, can move diagonally to edge of palace as well
-            if direction in ['upright', 'downright', 'downleft', 'upleft'] and location not in palace_diag_squares:
-                # if cannon is not in diagonally connected palace squares, it can't move diagonally
-                stop_flag = True
-            while stop_flag is False:
-                # Set next location based on direction
-                if direction == 'up':
-                    next_location = chr(ord(last_col)) + str(last_row + 1)
-                elif direction == 'right':
-                    next_location = chr(ord(last_col) + 1) + str(last_row)
-                elif direction == 'down':
-                    next_location = chr(ord(last_col)) + str(last_row - 1)
-                elif direction == 'left':
-                    next_location = chr(ord(last_col) - 1) + str(last_row)
-                elif direction == 'upright':
-                    next_location = chr(ord(last_col) + 1) + str(last_row + 1)
-                elif direction == 'downright':
-                    next_location = chr(ord(last_col) + 1) + str(last_row - 1)
-                elif direction == 'downleft':
-                    next_location = chr(ord(last_col) - 1) + str(last_row - 1)
-                else:
-                    next_location = chr(ord(last_col) - 1) + str(last_row + 1)
-                next_square = gameboard.get_square(next_location)
-
-                # add moves to move_list if they are valid
-                # if next square is off board, stop
-                if next_square is None:
-                    stop_flag = True
-                # if the next unit is a cannon, stop, cannot jump or capture cannon
-                elif next_square != "__" and next_square.get_type() == 'Cannon':
-                    stop_flag = True
-                # if moving diagonally, and next square is outside the palace, stop
-                elif direction in ['upright', 'downright', 'downleft',
-                                   'upleft'] and next_location not in palace_squares:
-                    stop_flag = True
+        squares = gameboard.get_squares()
+        team = self.team
+
+        # Cannon moves along 4 orthogonal rays, plus the palace diagonal rays when on a diagonally connected square.
+        # It must jump a unit
+        for ray in LINE_RAYS[square]:
+            jumped = False
+            for next_square in ray:
+                value = squares[next_square]
                 # if next square is empty, can move there so long as there is one piece in the way
-                elif next_square == '__' and unit_counter == 1:
-                    move_list.append(next_location)
-                # if next square is empty but we haven't passed a unit, move to next iteration
-                # adding this condition so next if condition methods don't get called on strings
-                elif next_square == '__' and unit_counter != 1:
-                    pass
-                # if next square is ally, and we've jumped a unit, stop
-                elif next_square.get_team() == self.get_team() and unit_counter == 1:
-                    stop_flag = True
+                if value is EMPTY:
+                    if jumped:
+                        move_list.append(next_square)
+                # if the next unit is a cannon, stop, cannot jump or capture cannon
+                elif value.kind == CANNON:
+                    break
+                # if next square is unit and we haven't jumped yet, jump it but don't add space to move pool
+                elif not jumped:
+                    jumped = True
                 # if next square is enemy, and we've jumped a unit, can move to space and then stop
-                elif next_square.get_team() != self.get_team() and unit_counter == 1:
-                    move_list.append(next_location)
-                    stop_flag = True
-                # if next square is unit increment unit counter but don't add space to move pool
-                elif next_square is not None and next_square != '__' and next_square.get_type() != 'Cannon':
-                    unit_counter += 1
-
-                # advance last col/row info to next square for next iteration
-                last_col = next_location[0]
-                last_row = int(next_location[1:])
+                else:
+                    if value.team != team:
+                        move_list.append(next_square)
+                    break
 
-        return set(move_list)
+        return move_list
 
 
 class Soldier(GamePiece):
     """
     Soldier Class. The Solider can move forward or sideways, but not backwards.
     """
-    def __init__(self, team):
-        """Init Soldier with new type"""
-        super().__init__(team)
-        self._type = "Soldier"
-
-    def __str__(self):
-        """Override print method to display gamepiece in terminal"""
-        return colored("SD", self._team)
+    __slots__ = ()
+    _type = "Soldier"
+    kind = SOLDIER
+    _symbol = "SD"
 
-    def valid_moves(self, location, gameboard):
-        """Determines valid moves for the piece, given the starting location, and the state of the gameboard"""
-        move_list = []
-        starting_col = location[0]
-        starting_row = int(location[1:])
-        # get enemy team palace squares for diagonal movement validation
-        team = self.get_team()
-        if team == 'red':
-            enemy_team = 'blue'
-        else:
-            enemy_team = 'red'
-        palace_squares = gameboard.get_palace(enemy_team)
-        palace_diag_squares = gameboard.get_team_diag_palace(enemy_team)
-
-        # Create 5 possible moves, forward movement depending on team
-        move_sideways_1 = chr(ord(starting_col) - 1) + str(starting_row)
-        move_sidweays_2 = chr(ord(starting_col) + 1) + str(starting_row)
-        if self.get_team() == 'blue':
-            move_forward = chr(ord(starting_col)) + str(starting_row - 1)
-            move_diag_1 = chr(ord(starting_col) + 1) + str(starting_row - 1)
-            move_diag_2 = chr(ord(starting_col) - 1) + str(starting_row - 1)
-        else:
-            move_forward = chr(ord(starting_col)) + str(starting_row + 1)
-            move_diag_1 = chr(ord(starting_col) + 1) + str(starting_row + 1)
-            move_diag_2 = chr(ord(starting_col) - 1) + str(starting_row + 1)
-
-        # check that move is not off the board/onto a friendly piece
-        for move in [move_sideways_1, move_sidweays_2, move_forward]:
-            if gameboard.get_square(move) is not None and (
-                    gameboard.get_square(move) == '__' or
-                    gameboard.get_square(move).get_team() != self.get_team()):
-                move_list.append(move)
-        # Check diagonal moves for being in the palace and originating from diagonally connected squares
-        for move in [move_diag_1, move_diag_2]:
-            if gameboard.get_square(
-                    move) is not None and move in palace_squares and location in palace_diag_squares and (
-                    gameboard.get_square(move) == '__' or gameboard.get_square(move).get_team() != self.get_team()):
-                move_list.append(move)
-
-        return set(move_list)
+    def destinations(self, square, gameboard):
+        """Determines valid moves for the piece, given the starting square, and the state of the gameboard"""
+        squares = gameboard.get_squares()
+        team = self.team
+        # Sideways and forward moves, plus forward diagonals within the enemy palace, not onto a friendly piece
+        return [move for move in SOLDIER_MOVES[team][square]
+                if squares[move] is EMPTY or squares[move].team != team]
 
 
 def main():
     """Run game using pygame"""
+    # pygame is only imported by the GUI, so the rules engine and AI can run headless without it
+    import pygame
 
     # Initialize pygame
     pygame.init()
@@ -917,57 +1186,43 @@ def main():
 
     # Create surface of same color as board at bottom to extend usable space
     bottom_space = pygame.Surface((screen_width, screen_height - board_height))
-
-    # Create dict to map game location string to screen coord - [col, row]
-    board_to_coord_map = {}
-    col_counter = 0
-    for col in ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i']:
-        for row in range(1, 11):
-            board_to_coord_map[col + str(row)] = (0.05 * screen_width + .112676 * screen_width * col_counter,
-                                                  0.05 * screen_width + .112676 * screen_width * (row-1))
-        col_counter += 1
-
-    # Generate list of rectangles to detect clicking
-    piece_rect_list = []
-    for key, val in board_to_coord_map.items():
-        location_rect = pygame.Rect(0, 0, piece_width, piece_height)
-        location_rect.center = val
-        piece_rect_list.append(location_rect)
+    pygame.Surface.fill(bottom_space, board_color)
+    bottom_rect = pygame.Rect(0, board_height, screen_width, screen_height - board_height)
+
+    # Screen coord of the a1 intersection, and distance between intersections
+    board_origin = 0.05 * screen_width
+    square_spacing = .112676 * screen_width
+
+    # Screen coord of the center, rectangle (to detect clicking and redraw) and piece image position of each square,
+    # by square index
+    square_rects = []
+    square_blit_positions = []
+    for square in range(90):
+        center = (board_origin + square_spacing * (square % 9), board_origin + square_spacing * (square // 9))
+        square_rect = pygame.Rect(0, 0, piece_width, piece_height)
+        square_rect.center = center
+        square_rects.append(square_rect)
+        square_blit_positions.append((center[0] - piece_width // 2, center[1] - piece_height // 2))
+
+    def square_at(pos):
+        """Return the index of the square whose rectangle contains screen position pos, or None"""
+        col = int((pos[0] - board_origin + square_spacing / 2) // square_spacing)
+        row = int((pos[1] - board_origin + square_spacing / 2) // square_spacing)
+        if 0 <= col < 9 and 0 <= row < 10 and square_rects[row * 9 + col].collidepoint(pos):
+            return row * 9 + col
+        return None
 
     # Create game won font and message font
     pygame.font.init()
     endgame_font = pygame.font.SysFont('Palatino Linotype', 70)
     message_font = pygame.font.SysFont('Palatino Linotype', 20)
 
-    # Load piece images
-    red_king = pygame.transform.scale(pygame.image.load(os.path.join('images', 'red_king.png')),
-                                      (piece_width, piece_height))
-    blue_king = pygame.transform.scale(pygame.image.load(os.path.join('images', 'blue_king.png')),
-                                       (piece_width, piece_height))
-    red_guard = pygame.transform.scale(pygame.image.load(os.path.join('images', 'red_advisor.png')),
-                                       (piece_width, piece_height))
-    blue_guard = pygame.transform.scale(pygame.image.load(os.path.join('images', 'blue_advisor.png')),
-                                        (piece_width, piece_height))
-    red_horse = pygame.transform.scale(pygame.image.load(os.path.join('images', 'red_horse.png')),
-                                       (piece_width, piece_height))
-    blue_horse = pygame.transform.scale(pygame.image.load(os.path.join('images', 'blue_horse.png')),
-                                        (piece_width, piece_height))
-    red_elephant = pygame.transform.scale(pygame.image.load(os.path.join('images', 'red_elephant.png')),
-                                          (piece_width, piece_height))
-    blue_elephant = pygame.transform.scale(pygame.image.load(os.path.join('images', 'blue_elephant.png')),
-                                           (piece_width, piece_height))
-    red_chariot = pygame.transform.scale(pygame.image.load(os.path.join('images', 'red_chariot.png')),
-                                         (piece_width, piece_height))
-    blue_chariot = pygame.transform.scale(pygame.image.load(os.path.join('images', 'blue_chariot.png')),
-                                          (piece_width, piece_height))
-    red_cannon = pygame.transform.scale(pygame.image.load(os.path.join('images', 'red_cannon.png')),
-                                        (piece_width, piece_height))
-    blue_cannon = pygame.transform.scale(pygame.image.load(os.path.join('images', 'blue_cannon.png')),
-                                         (piece_width, piece_height))
-    red_soldier = pygame.transform.scale(pygame.image.load(os.path.join('images', 'red_pawn.png')),
-                                         (piece_width, piece_height))
-    blue_soldier = pygame.transform.scale(pygame.image.load(os.path.join('images', 'blue_pawn.png')),
-                                          (piece_width, piece_height))
+    # Load piece images, by team code and piece type code
+    piece_image_names = ('king', 'advisor', 'horse', 'elephant', 'chariot', 'cannon', 'pawn')
+    piece_images = tuple(
+        tuple(pygame.transform.scale(pygame.image.load(os.path.join('images', team + '_' + name + '.png')),
+                                     (piece_width, piece_height)) for name in piece_image_names)
+        for team in TEAMS)
 
     # Load skip and surrender buttons
     skip_button = pygame.transform.scale(pygame.image.load(os.path.join('images', 'skip_button.png')), (piece_width, piece_width))
@@ -1001,77 +1256,66 @@ def main():
 
     # Init Janggi game
     game = JanggiGame()
+    # Keep attack counts up to date for the check tests of make_move and get_status instead of recomputing them
+    game.enable_attack_map()
 
-    def update_gui():
-        """Update the pygame gui"""
-        game_board = game.get_janggi_board().get_board()
-        for key_col in sorted(game_board):
-            row_counter = 1
-            for value in game_board[key_col]:
-                if value != "__" and value.get_type() == "Soldier":
-                    if value.get_team() == 'red':
-                        coord = (board_to_coord_map[key_col + str(row_counter)][0], board_to_coord_map[key_col + str(row_counter)][1])
-                        screen.blit(red_soldier, (coord[0] - piece_width // 2, coord[1] - piece_height // 2))
-                    if value.get_team() == 'blue':
-                        coord = (board_to_coord_map[key_col + str(row_counter)][0], board_to_coord_map[key_col + str(row_counter)][1])
-                        screen.blit(blue_soldier, (coord[0] - piece_width // 2, coord[1] - piece_height // 2))
-                elif value != "__" and value.get_type() == "General":
-                    if value.get_team() == 'red':
-                        coord = (board_to_coord_map[key_col + str(row_counter)][0], board_to_coord_map[key_col + str(row_counter)][1])
-                        screen.blit(red_king, (coord[0] - piece_width // 2, coord[1] - piece_height // 2))
-                    if value.get_team() == 'blue':
-                        coord = (board_to_coord_map[key_col + str(row_counter)][0], board_to_coord_map[key_col + str(row_counter)][1])
-                        screen.blit(blue_king, (coord[0] - piece_width // 2, coord[1] - piece_height // 2))
-                elif value != "__" and value.get_type() == "Guard":
-                    if value.get_team() == 'red':
-                        coord = (board_to_coord_map[key_col + str(row_counter)][0], board_to_coord_map[key_col + str(row_counter)][1])
-                        screen.blit(red_guard, (coord[0] - piece_width // 2, coord[1] - piece_height // 2))
-                    if value.get_team() == 'blue':
-                        coord = (board_to_coord_map[key_col + str(row_counter)][0], board_to_coord_map[key_col + str(row_counter)][1])
-                        screen.blit(blue_guard, (coord[0] - piece_width // 2, coord[1] - piece_height // 2))
-                elif value != "__" and value.get_type() == "Horse":
-                    if value.get_team() == 'red':
-                        coord = (board_to_coord_map[key_col + str(row_counter)][0], board_to_coord_map[key_col + str(row_counter)][1])
-                        screen.blit(red_horse, (coord[0] - piece_width // 2, coord[1] - piece_height // 2))
-                    if value.get_team() == 'blue':
-                        coord = (board_to_coord_map[key_col + str(row_counter)][0], board_to_coord_map[key_col + str(row_counter)][1])
-                        screen.blit(blue_horse, (coord[0] - piece_width // 2, coord[1] - piece_height // 2))
-                elif value != "__" and value.get_type() == "Elephant":
-                    if value.get_team() == 'red':
-                        coord = (board_to_coord_map[key_col + str(row_counter)][0], board_to_coord_map[key_col + str(row_counter)][1])
-                        screen.blit(red_elephant, (coord[0] - piece_width // 2, coord[1] - piece_height // 2))
-                    if value.get_team() == 'blue':
-                        coord = (board_to_coord_map[key_col + str(row_counter)][0], board_to_coord_map[key_col + str(row_counter)][1])
-                        screen.blit(blue_elephant, (coord[0] - piece_width // 2, coord[1] - piece_height // 2))
-                elif value != "__" and value.get_type() == "Chariot":
-                    if value.get_team() == 'red':
-                        coord = (board_to_coord_map[key_col + str(row_counter)][0], board_to_coord_map[key_col + str(row_counter)][1])
-                        screen.blit(red_chariot, (coord[0] - piece_width // 2, coord[1] - piece_height // 2))
-                    if value.get_team() == 'blue':
-                        coord = (board_to_coord_map[key_col + str(row_counter)][0], board_to_coord_map[key_col + str(row_counter)][1])
-                        screen.blit(blue_chariot, (coord[0] - piece_width // 2, coord[1] - piece_height // 2))
-                elif value != "__" and value.get_type() == "Cannon":
-                    if value.get_team() == 'red':
-                        coord = (board_to_coord_map[key_col + str(row_counter)][0], board_to_coord_map[key_col + str(row_counter)][1])
-                        screen.blit(red_cannon, (coord[0] - piece_width // 2, coord[1] - piece_height // 2))
-                    if value.get_team() == 'blue':
-                        coord = (board_to_coord_map[key_col + str(row_counter)][0], board_to_coord_map[key_col + str(row_counter)][1])
-                        screen.blit(blue_cannon, (coord[0] - piece_width // 2, coord[1] - piece_height // 2))
-
-                row_counter += 1
-        return True
+    # The AI thinks in a background thread within this budget (see JanggiThinker.py), while the game loop keeps
+    # handling input and drawing. Imported here, as JanggiThinker builds on this module
+    from JanggiThinker import Thinker
+    ai_time_limit = 1.0
+    ai_node_limit = None
+    ai_event = pygame.USEREVENT
+
+    def ai_progress_callback(result):
+        """Called from the AI thread after each search iteration, posts the SearchResult to the game loop"""
+        pygame.event.post(pygame.event.Event(ai_event, result=result))
+
+    def ai_done_callback(result):
+        """Called from the AI thread when the search is over, wakes up the game loop to play the move"""
+        pygame.event.post(pygame.event.Event(ai_event, result=None))
+
+    thinker = Thinker(ai_time_limit, ai_node_limit, progress=ai_progress_callback, done=ai_done_callback)
+    # Last SearchResult reported by the AI while it thinks, shown in the bottom panel
+    ai_progress = None
+
+    def update_gui(squares, selected_square=None):
+        """
+        Redraw the given squares of the board: background, outline if it is the selected square, and piece. Returns
+        the list of screen rectangles that changed
+        """
+        board_squares = game.get_janggi_board().get_squares()
+        dirty_rects = []
+        for square in squares:
+            value = board_squares[square]
+            # Piece positions are not whole pixels, so clear a slightly larger area than the square
+            dirty_rect = square_rects[square].inflate(2, 2)
+            screen.blit(bg_scaled, dirty_rect, dirty_rect)
+            dirty_rects.append(dirty_rect)
+            if square == selected_square:
+                pygame.draw.rect(screen, red_color if value.get_team() == 'red' else blue_color, square_rects[square], 4)
+            if value is not EMPTY:
+                screen.blit(piece_images[value.team][value.kind], square_blit_positions[square])
+
+        return dirty_rects
 
     # Run game loop
     running = True
-    from_coords = None
-    to_coords = None
-    from_rect = None
+    from_square = None
+    to_square = None
     blue_swap = False
     red_swap = False
     swap_over = False
     ai_decision = False
     ai_yes = False
 
+    # The loop sleeps on the event queue while nothing changes, and otherwise draws at most frame_rate frames per
+    # second. Only the squares and bottom panel that changed since the last frame are drawn and updated on screen
+    frame_rate = 30
+    clock = pygame.time.Clock()
+    drawn_squares = None
+    drawn_selected_square = None
+    drawn_panel = None
+
     # CODE BELOW IS THE GAME LOOP
     while running:
         skip_flag = False
@@ -1081,27 +1325,34 @@ def main():
         if red_swap is True and blue_swap is True:
             swap_over = True
 
-        if to_coords is not None:
-            from_coords = None
-            to_coords = None
-            from_rect = None
+        if to_square is not None:
+            from_square = None
+            to_square = None
 
-        for event in pygame.event.get():
+        # The AI plays red, the user can't move pieces or pass while it thinks
+        ai_turn = ai_yes is True and player_turn == 'red'
+
+        # Wait for an event if the screen is up to date. The AI thread posts an event with each progress report
+        panel = (player_turn, game.get_game_state(), swap_over, ai_decision, ai_progress)
+        if drawn_squares == game.get_janggi_board().get_squares() and drawn_panel == panel:
+            events = [pygame.event.wait()] + pygame.event.get()
+        else:
+            clock.tick(frame_rate)
+            events = pygame.event.get()
+
+        for event in events:
             # Did the user click the window close button?
             if event.type == pygame.QUIT:
                 running = False
-            if event.type == pygame.MOUSEBUTTONUP and from_coords is not None and swap_over is True and ai_decision is True:
-                for rectangle in piece_rect_list:
-                    if rectangle.collidepoint(event.pos):
-                        to_coords = rectangle.center
-            if event.type == pygame.MOUSEBUTTONUP and from_coords is None and swap_over is True and ai_decision is True:
-                for rectangle in piece_rect_list:
-                    if rectangle.collidepoint(event.pos):
-                        from_coords = rectangle.center
-                        from_rect = rectangle
+            if event.type == ai_event and event.result is not None:
+                ai_progress = event.result
+            if event.type == pygame.MOUSEBUTTONUP and from_square is not None and swap_over is True and ai_decision is True and ai_turn is False:
+                to_square = square_at(event.pos)
+            if event.type == pygame.MOUSEBUTTONUP and from_square is None and swap_over is True and ai_decision is True and ai_turn is False:
+                from_square = square_at(event.pos)
             if event.type == pygame.MOUSEBUTTONUP and surrender_button_rect.collidepoint(event.pos) and swap_over is True and ai_decision is True:
                 surrender_flag = True
-            if event.type == pygame.MOUSEBUTTONUP and skip_button_rect.collidepoint(event.pos) and swap_over is True and ai_decision is True:
+            if event.type == pygame.MOUSEBUTTONUP and skip_button_rect.collidepoint(event.pos) and swap_over is True and ai_decision is True and ai_turn is False:
                 skip_flag = True
             if event.type == pygame.MOUSEBUTTONUP and left_button_rect.collidepoint(event.pos) and swap_over is False and ai_decision is True:
                 if player_turn == 'blue':
@@ -1145,117 +1396,132 @@ def main():
             if event.type == pygame.MOUSEBUTTONUP and none_button_rect.collidepoint(event.pos) and ai_decision is False:
                 ai_decision = True
 
-        # pass turn if skip_flag is true
-        player_in_check_at_beginning_of_turn = game.is_in_check(game.get_player_turn())
+        # pass turn if skip_flag is true. The status is only computed again after the position changes
+        player_in_check_at_beginning_of_turn = game.get_status().in_check[TEAM_CODES[game.get_player_turn()]]
         if skip_flag is True and player_in_check_at_beginning_of_turn is False:
             game.change_turn()
 
-        # End game if player surrenders
+        # End game if player surrenders. Against the AI the user plays blue, and can also surrender while the AI thinks
         if surrender_flag is True:
-            if player_turn == 'red':
+            if player_turn == 'red' and ai_yes is False:
                 game.set_game_state('BLUE_WON')
             else:
                 game.set_game_state('RED_WON')
 
-        from_location = None
-        to_location = None
-        # Convert from, to coords to location input
-        for key, val in board_to_coord_map.items():
-            if from_coords == (int(val[0]), int(val[1])):
-                from_location = key
-            if to_coords == (int(val[0]), int(val[1])):
-                to_location = key
-
         # Make Move
-        if from_location is not None and to_location is not None:
-            game.make_move(from_location, to_location)
-
-        # Clear Screen
-        screen.fill(white_color)
-
-        # Add background image
-        screen.blit(bg_scaled, (0, 0))
-
-        # Add dead space at bottom
-        screen.blit(bottom_space, (0, board_height))
-
-        # fill in the bottom space with board color
-        pygame.Surface.fill(bottom_space, board_color)
-
-        # get team color and update move prompter
-        if player_turn == 'red' and ai_yes is False:
-            turn = red_color
-        elif player_turn == 'blue':
-            turn = blue_color
+        if from_square is not None and to_square is not None:
+            game.make_move(SQUARE_NAMES[from_square], SQUARE_NAMES[to_square])
+
+        # Squares whose piece changed, and the old and new selected squares, are redrawn. The whole board is drawn on
+        # the first frame
+        board_squares = game.get_janggi_board().get_squares()
+        selected_square = None
+        if from_square is not None and swap_over is True and game.get_game_state() == "UNFINISHED":
+            from_piece = board_squares[from_square]
+            if from_piece is not EMPTY and from_piece.get_team() == player_turn:
+                selected_square = from_square
+        if drawn_squares is None:
+            # Clear Screen and add background image
+            screen.fill(white_color)
+            screen.blit(bg_scaled, (0, 0))
+            dirty_squares = range(90)
         else:
-            turn = black_color
-
-        # Place colored circle at bottom to signal turn
-        if game.get_game_state() == "UNFINISHED" and swap_over is True:
-            filled_circle_size = (0.14 * screen_height) // 4
-            circle_thickness = int(.2 * filled_circle_size)
-            pygame.draw.circle(screen, turn, (screen_width // 2, board_height + (screen_height - board_height) * .5), filled_circle_size)
-            pygame.draw.circle(screen, black_color, (screen_width // 2, board_height + (screen_height - board_height) * .5), filled_circle_size + circle_thickness, circle_thickness)
-
-        # add pass and surrender buttons as long as game is unfinished
-        if game.get_game_state() == "UNFINISHED" and swap_over is True and (ai_yes is False or (ai_yes is True and player_turn == 'blue')):
-            screen.blit(skip_button, skip_button_rect)
-            screen.blit(surrender_button, surrender_button_rect)
-
-        # Draw rectangle around selected from move
-        if from_rect is not None and swap_over is True and game.get_game_state() == "UNFINISHED":
-            from_square = game.get_janggi_board().get_square(from_location)
-            if from_square != "__":
-                if player_turn == 'red' and from_square.get_team() == 'red':
-                    pygame.draw.rect(screen, red_color, from_rect, 4)
-                elif player_turn == 'blue' and from_square.get_team() == 'blue':
-                    pygame.draw.rect(screen, blue_color, from_rect, 4)
-
-        # print winning message after checkmate
-        if game.get_game_state() == 'BLUE_WON':
-            winning_message = endgame_font.render("Blue Team Won", False, blue_color)
-            screen.blit(winning_message, ((screen_width - winning_message.get_width()) // 2, ((screen_height - board_height) - winning_message.get_height()) // 2 + board_height))
-        elif game.get_game_state() == 'RED_WON':
-            winning_message = endgame_font.render("Red Team Won", False, red_color)
-            screen.blit(winning_message, ((screen_width - winning_message.get_width()) // 2, ((screen_height - board_height) - winning_message.get_height()) // 2 + board_height))
-
-        # output buttons/message for elephant/horse swap at beginning of game
-        if swap_over is False and ai_decision is True:
-            team_turn = game.get_player_turn()
-            swap_prompt_message = team_turn.upper() + " Please choose to swap Horses and Elephants. Choose Left, Both, Right, or None"
-            swap_prompt = message_font.render(swap_prompt_message, False, black_color)
-            screen.blit(swap_prompt, ((screen_width - swap_prompt.get_width()) // 2, ((screen_height - board_height) - swap_prompt.get_height()) * .1 + board_height))
-            screen.blit(left_button, left_button_rect)
-            screen.blit(right_button, right_button_rect)
-            screen.blit(both_button, both_button_rect)
-            screen.blit(none_button, none_button_rect)
-
-        # output AI decision buttons at beginning of game
-        if ai_decision is False:
-            ai_prompt_message = "Would you like to play vs a computer? Select Yes or No"
-            ai_prompt = message_font.render(ai_prompt_message, False, black_color)
-            screen.blit(ai_prompt, ((screen_width - ai_prompt.get_width()) // 2, ((screen_height - board_height) - ai_prompt.get_height()) * .1 + board_height))
-            screen.blit(none_button, none_button_rect)
-            screen.blit(yes_button, yes_button_rect)
-
-        # Update gui
-        update_gui()
-        pygame.display.update()
-
-        # AI loop
-        if ai_yes is True and player_turn == 'red' and swap_over is True and game.get_game_state() == "UNFINISHED":
-            # necesary to add loop in case the AI tries to make an invalid move (since the auto_move functions doesn't validate all moves)
-            loop_iterations = 0
-            while game.get_player_turn() == 'red':
-                move_set = game.auto_move(player_turn)
-                pygame.time.delay(1000)
-                game.make_move(move_set[0], move_set[1])
-                player_in_check_at_beginning_of_turn = game.is_in_check(game.get_player_turn())
-                # Sometimes the AI gets stuck if their only valid move is to pass, since passing isn't in move set
-                if loop_iterations > 10 and player_in_check_at_beginning_of_turn is False:
+            dirty_squares = [square for square in range(90) if board_squares[square] is not drawn_squares[square]]
+            if selected_square != drawn_selected_square:
+                for square in (selected_square, drawn_selected_square):
+                    if square is not None and square not in dirty_squares:
+                        dirty_squares.append(square)
+        dirty_rects = update_gui(dirty_squares, selected_square)
+        if drawn_squares is None:
+            dirty_rects = [screen.get_rect()]
+        drawn_squares = list(board_squares)
+        drawn_selected_square = selected_square
+
+        # The bottom panel is redrawn when the turn, game state or prompts change
+        panel = (player_turn, game.get_game_state(), swap_over, ai_decision, ai_progress)
+        if panel != drawn_panel:
+            # Add dead space at bottom
+            screen.blit(bottom_space, (0, board_height))
+
+            # get team color and update move prompter
+            if player_turn == 'red' and ai_yes is False:
+                turn = red_color
+            elif player_turn == 'blue':
+                turn = blue_color
+            else:
+                turn = black_color
+
+            # Place colored circle at bottom to signal turn
+            if game.get_game_state() == "UNFINISHED" and swap_over is True:
+                filled_circle_size = (0.14 * screen_height) // 4
+                circle_thickness = int(.2 * filled_circle_size)
+                pygame.draw.circle(screen, turn, (screen_width // 2, board_height + (screen_height - board_height) * .5), filled_circle_size)
+                pygame.draw.circle(screen, black_color, (screen_width // 2, board_height + (screen_height - board_height) * .5), filled_circle_size + circle_thickness, circle_thickness)
+
+            # add pass and surrender buttons as long as game is unfinished, pass only on the user's turn
+            if game.get_game_state() == "UNFINISHED" and swap_over is True:
+                if ai_turn is False:
+                    screen.blit(skip_button, skip_button_rect)
+                screen.blit(surrender_button, surrender_button_rect)
+
+            # show the depth and best move of the AI search while it thinks
+            if ai_progress is not None:
+                ai_message = "Thinking: depth {}, best move {}{}".format(
+                    ai_progress.depth, SQUARE_NAMES[ai_progress.move[0]], SQUARE_NAMES[ai_progress.move[1]])
+                ai_prompt = message_font.render(ai_message, False, black_color)
+                screen.blit(ai_prompt, ((screen_width - ai_prompt.get_width()) // 2, ((screen_height - board_height) - ai_prompt.get_height()) * .1 + board_height))
+
+            # print winning message after checkmate
+            if game.get_game_state() == 'BLUE_WON':
+                winning_message = endgame_font.render("Blue Team Won", False, blue_color)
+                screen.blit(winning_message, ((screen_width - winning_message.get_width()) // 2, ((screen_height - board_height) - winning_message.get_height()) // 2 + board_height))
+            elif game.get_game_state() == 'RED_WON':
+                winning_message = endgame_font.render("Red Team Won", False, red_color)
+                screen.blit(winning_message, ((screen_width - winning_message.get_width()) // 2, ((screen_height - board_height) - winning_message.get_height()) // 2 + board_height))
+
+            # output buttons/message for elephant/horse swap at beginning of game
+            if swap_over is False and ai_decision is True:
+                team_turn = game.get_player_turn()
+                swap_prompt_message = team_turn.upper() + " Please choose to swap Horses and Elephants. Choose Left, Both, Right, or None"
+                swap_prompt = message_font.render(swap_prompt_message, False, black_color)
+                screen.blit(swap_prompt, ((screen_width - swap_prompt.get_width()) // 2, ((screen_height - board_height) - swap_prompt.get_height()) * .1 + board_height))
+                screen.blit(left_button, left_button_rect)
+                screen.blit(right_button, right_button_rect)
+                screen.blit(both_button, both_button_rect)
+                screen.blit(none_button, none_button_rect)
+
+            # output AI decision buttons at beginning of game
+            if ai_decision is False:
+                ai_prompt_message = "Would you like to play vs a computer? Select Yes or No"
+                ai_prompt = message_font.render(ai_prompt_message, False, black_color)
+                screen.blit(ai_prompt, ((screen_width - ai_prompt.get_width()) // 2, ((screen_height - board_height) - ai_prompt.get_height()) * .1 + board_height))
+                screen.blit(none_button, none_button_rect)
+                screen.blit(yes_button, yes_button_rect)
+            dirty_rects.append(bottom_rect)
+            drawn_panel = panel
+
+        # Update only the changed parts of the screen
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+
+        # AI loop: start thinking on the AI's turn, play the move once the search is done. The search is cancelled if the
+        # game ends while it thinks, for example when the user surrenders
+        if ai_yes is True and game.get_player_turn() == 'red' and swap_over is True and game.get_game_state() == "UNFINISHED":
+            if thinker.get_result() is not None:
+                result = thinker.take_result()
+                ai_progress = None
+                # The search only returns legal moves. If the AI has no legal moves, it passes
+                if result.move is None:
                     game.change_turn()
-                loop_iterations += 1
+                else:
+                    game.make_move(SQUARE_NAMES[result.move[0]], SQUARE_NAMES[result.move[1]])
+            elif not thinker.is_thinking():
+                thinker.start(game)
+        else:
+            thinker.cancel()
+            ai_progress = None
 
+    thinker.cancel()
     pygame.quit()
 
 
@@ -0,0 +1,142 @@
+# Parallel root search for the Janggi AI. The search runs in a pool of worker processes (threads would be held back by
+# the GIL). In each iteration of the iterative deepening the previous best move is searched first with a full window,
+# then the other root moves are split between the workers and searched with a null window around its score, which is
+# enough to prove they are no better. The few that fail high are searched again in parallel to get their real score.
+# Workers keep their own transposition table between tasks unless deterministic mode is used.
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+import time
+from JanggiPosition import pack_position, unpack_position
+from JanggiSearch import Searcher, TranspositionTable, SearchResult, MATE_BOUND, INFINITY
+
+# Transposition table of a worker process, kept between tasks. Created by _init_worker
+_worker_table = None
+# Search generation of the last task run by the worker, see ParallelSearcher.search
+_worker_generation = None
+
+# Size of the fresh transposition table each task gets in deterministic mode
+DETERMINISTIC_TABLE_SIZE = 1 << 16
+
+
+def _init_worker():
+    """Create the transposition table of a worker process"""
+    global _worker_table
+    _worker_table = TranspositionTable()
+
+
+def _search_root_move(position, move, depth, alpha, beta, deadline, deterministic, generation):
+    """
+    Worker task: search one root move of position (packed, see JanggiPosition) to depth within (alpha, beta) and
+    return its SearchResult (score None if the budget ran out). deadline is a time.time() value shared by all
+    workers, or None. The worker table starts a new generation when generation changes, once per search.
+    """
+    global _worker_generation
+    game = unpack_position(position)
+    if deterministic:
+        table = TranspositionTable(DETERMINISTIC_TABLE_SIZE)
+    else:
+        table = _worker_table
+        if generation != _worker_generation:
+            table.new_search()
+            _worker_generation = generation
+    time_limit = None if deadline is None else max(0.0, deadline - time.time())
+    return Searcher(game, table).search_move(move, depth, None, time_limit, alpha, beta)
+
+
+class ParallelSearcher:
+    """
+    Root splitting search over a pool of worker processes, with the same search() interface as Searcher. Each
+    iteration searches every root move to the same depth and keeps the best, ties going to the move searched first
+    (the best move of the previous iteration). The pool is started on the first search and kept until close() is
+    called.
+
+    In deterministic mode every task starts from an empty transposition table, and the time limit is only checked
+    between iterations, so the result only depends on the position, max_depth and node_limit, and not on how the tasks
+    were scheduled. Otherwise workers share nothing but keep their tables between tasks, and stop mid iteration when
+    time runs out.
+    """
+    def __init__(self, game, workers=None, deterministic=False):
+        """Init ParallelSearcher for game with a number of worker processes, defaulting to the number of CPUs"""
+        self._game = game
+        self._workers = workers or os.cpu_count()
+        self._deterministic = deterministic
+        self._executor = None
+        self._nodes = 0
+        self._task_deadline = None
+        # Counts the searches, so the worker tables start one new generation per search and not per task
+        self._generation = 0
+
+    def get_workers(self):
+        """Return the number of worker processes"""
+        return self._workers
+
+    def close(self):
+        """Shut down the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def search(self, max_depth=64, node_limit=None, time_limit=None, callback=None):
+        """
+        Search the position of the game for the player to move. Stops after max_depth, once an iteration ends with
+        node_limit or more nodes visited in total, or once time_limit seconds have passed. callback, if given, is
+        called with the SearchResult of each completed iteration. Returns a SearchResult, whose move is None if the
+        player to move has no legal moves.
+        """
+        start_time = time.time()
+        deadline = None if time_limit is None else start_time + time_limit
+        root_moves = self._game.legal_moves()
+        if not root_moves:
+            return SearchResult(None, 0, 0, 0, 0.0, [])
+        result = SearchResult(root_moves[0], 0, 0, 0, 0.0, [root_moves[0]])
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self._workers, initializer=_init_worker)
+
+        position = pack_position(self._game)
+        self._nodes = 0
+        self._generation += 1
+        for depth in range(1, max_depth + 1):
+            self._task_deadline = None if self._deterministic else deadline
+            move_results = self._search_moves(position, root_moves[:1], depth, -INFINITY, INFINITY)
+            if move_results is None:
+                break
+            best = move_results[0]
+            # The other moves only need to be proven no better than the first, moves that fail high get their real
+            # score from a second search
+            others = self._search_moves(position, root_moves[1:], depth, best.score, best.score + 1)
+            if others is None:
+                break
+            better_moves = [move_result.move for move_result in others if move_result.score > best.score]
+            better = self._search_moves(position, better_moves, depth, best.score, INFINITY)
+            if better is None:
+                break
+            better = {move_result.move: move_result for move_result in better}
+            move_results += [better.get(move_result.move, move_result) for move_result in others]
+
+            # Best move first, the sort is stable so equal scores keep the previous order
+            move_results.sort(key=lambda move_result: -move_result.score)
+            root_moves = [move_result.move for move_result in move_results]
+            best = move_results[0]
+            nodes = self._nodes
+            result = SearchResult(best.move, best.score, depth, nodes, time.time() - start_time, best.pv)
+            if callback is not None:
+                callback(result)
+            if abs(best.score) >= MATE_BOUND or node_limit is not None and nodes >= node_limit or \
+                    deadline is not None and time.time() >= deadline:
+                break
+
+        return result._replace(nodes=self._nodes, time=time.time() - start_time)
+
+    def _search_moves(self, position, moves, depth, alpha, beta):
+        """
+        Search root moves of position in parallel to depth within (alpha, beta). Returns their SearchResults in the
+        order of moves, or None if the time ran out before all of them were searched.
+        """
+        futures = [self._executor.submit(_search_root_move, position, move, depth, alpha, beta, self._task_deadline,
+                                         self._deterministic, self._generation) for move in moves]
+        move_results = [future.result() for future in futures]
+        self._nodes += sum(move_result.nodes for move_result in move_results)
+        if any(move_result.score is None for move_result in move_results):
+            return None
+        return move_results
@@ -0,0 +1,237 @@
+# Perft (performance test) for the Janggi move generator. Counts the leaf nodes of the legal move tree to a fixed depth
+# from known positions and compares them against recorded reference counts, reporting nodes per second. Any change to
+# move generation, check detection or the generals facing rule should keep these counts unchanged.
+#
+# With --verify, JanggiGame.get_attackers is also checked against the attacks of every piece (as used by the AttackMap)
+# in each position and the positions one ply away, and so is the BitBoard backend: the squares attacked by each team
+# against the AttackMap counts, and the squares each team can move to against the moves of its pieces.
+#
+# Usage: python JanggiPerft.py [--depth N] [--position NAME] [--divide] [--verify]
+
+import argparse
+import time
+from JanggiGame import JanggiGame, GameBoard, General, Guard, Horse, Elephant, Chariot, Cannon, Soldier
+from JanggiTables import SQUARE_NAMES, EMPTY, RED, BLUE
+from JanggiAttacks import attacked_by_piece
+from JanggiBitboard import mask_to_squares
+
+PIECE_CLASSES = {'General': General, 'Guard': Guard, 'Horse': Horse, 'Elephant': Elephant, 'Chariot': Chariot,
+                 'Cannon': Cannon, 'Soldier': Soldier}
+
+# Curated positions exercising cannon screens, palace diagonals, the generals facing rule and check evasion.
+# Each is (player to move, {location: (team, piece type)})
+TRICKY_POSITIONS = {
+    'cannons': ('blue', {
+        'e2': ('red', 'General'), 'd1': ('red', 'Guard'), 'f3': ('red', 'Guard'), 'e5': ('red', 'Cannon'),
+        'b3': ('red', 'Cannon'), 'a1': ('red', 'Chariot'), 'f6': ('red', 'Soldier'), 'c3': ('red', 'Horse'),
+        'e9': ('blue', 'General'), 'e10': ('blue', 'Guard'), 'b8': ('blue', 'Cannon'), 'h5': ('blue', 'Cannon'),
+        'c7': ('blue', 'Soldier'), 'h10': ('blue', 'Chariot'), 'g8': ('blue', 'Elephant')}),
+    'palace_diagonals': ('red', {
+        'e1': ('red', 'General'), 'e2': ('red', 'Guard'), 'f3': ('red', 'Cannon'), 'd8': ('red', 'Chariot'),
+        'd9': ('red', 'Soldier'), 'f10': ('blue', 'General'), 'e9': ('blue', 'Guard'), 'd10': ('blue', 'Horse'),
+        'a9': ('blue', 'Chariot'), 'h7': ('blue', 'Cannon'), 'd4': ('blue', 'Soldier')}),
+    'bikjang': ('blue', {
+        'e2': ('red', 'General'), 'd1': ('red', 'Guard'), 'a2': ('red', 'Chariot'), 'c5': ('red', 'Soldier'),
+        'e9': ('blue', 'General'), 'f10': ('blue', 'Guard'), 'e5': ('blue', 'Horse'), 'i9': ('blue', 'Chariot'),
+        'c10': ('blue', 'Elephant'), 'g4': ('blue', 'Soldier')}),
+    'check_evasion': ('blue', {
+        'd1': ('red', 'General'), 'e1': ('red', 'Guard'), 'i1': ('red', 'Chariot'), 'e5': ('red', 'Cannon'),
+        'g8': ('red', 'Horse'), 'd7': ('red', 'Soldier'), 'e9': ('blue', 'General'), 'e8': ('blue', 'Guard'),
+        'a9': ('blue', 'Chariot'), 'b9': ('blue', 'Cannon'), 'c7': ('blue', 'Elephant')}),
+    # Cannons screened by a chariot of their own team: a double check on e9, and b3/h3 both attacking a3
+    'chariot_screens': ('blue', {
+        'd2': ('red', 'General'), 'e5': ('red', 'Chariot'), 'e3': ('red', 'Cannon'), 'b3': ('red', 'Chariot'),
+        'h3': ('red', 'Cannon'), 'e9': ('blue', 'General'), 'd9': ('blue', 'Guard'), 'a3': ('blue', 'Horse'),
+        'a10': ('blue', 'Chariot'), 'h8': ('blue', 'Cannon')}),
+}
+
+# Reference leaf counts, indexed by depth - 1. Setups are named '<blue side>-<red side>' after swap_horse_elephant.
+# Counts were cross-checked against the original move-then-roll-back legality test of make_move
+REFERENCE_COUNTS = {
+    'start': (31, 949, 29868, 935304),
+    'neither-neither': (31, 949, 29868, 935304),
+    'neither-left': (31, 949, 29868, 929601),
+    'neither-right': (31, 949, 29868, 941032),
+    'neither-both': (31, 949, 29868, 935329),
+    'left-neither': (31, 949, 29697, 929457),
+    'left-left': (31, 949, 29697, 923740),
+    'left-right': (31, 949, 29697, 935174),
+    'left-both': (31, 949, 29697, 929457),
+    'right-neither': (31, 949, 30039, 941176),
+    'right-left': (31, 949, 30039, 935462),
+    'right-right': (31, 949, 30039, 946890),
+    'right-both': (31, 949, 30039, 941176),
+    'both-neither': (31, 949, 29868, 935329),
+    'both-left': (31, 949, 29868, 929601),
+    'both-right': (31, 949, 29868, 941032),
+    'both-both': (31, 949, 29868, 935304),
+    'cannons': (23, 690, 14813, 455378),
+    'palace_diagonals': (25, 450, 10748, 207696),
+    'bikjang': (26, 538, 14865, 308161),
+    'check_evasion': (5, 136, 2284, 58826),
+}
+
+
+def setup_position(player_turn, placement):
+    """Return a JanggiGame with only the pieces in placement ({location: (team, piece type)}) and player_turn to move"""
+    game = JanggiGame()
+    board = GameBoard()
+    for location, (team, piece_type) in placement.items():
+        board.set_square(location, PIECE_CLASSES[piece_type](team))
+    game.set_janggi_board(board, player_turn)
+    return game
+
+
+def setup_swap(blue_side, red_side):
+    """Return a JanggiGame in the starting position after both teams have swapped horses and elephants"""
+    game = JanggiGame()
+    game.swap_horse_elephant('blue', blue_side)
+    game.swap_horse_elephant('red', red_side)
+    return game
+
+
+def get_positions():
+    """Return dict of position name to a function creating the position"""
+    positions = {'start': JanggiGame}
+    for blue_side in ('neither', 'left', 'right', 'both'):
+        for red_side in ('neither', 'left', 'right', 'both'):
+            positions[blue_side + '-' + red_side] = (lambda b=blue_side, r=red_side: setup_swap(b, r))
+    for name, (player_turn, placement) in TRICKY_POSITIONS.items():
+        positions[name] = (lambda t=player_turn, p=placement: setup_position(t, p))
+    return positions
+
+
+def perft(game, depth):
+    """Return number of leaf nodes of the legal move tree of game, depth plies deep. Passes are not counted"""
+    moves = game.legal_moves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        game.push(move)
+        nodes += perft(game, depth - 1)
+        game.pop()
+    return nodes
+
+
+def divide(game, depth):
+    """Return dict of root move (e.g. 'a1a2') to the perft count below it"""
+    counts = {}
+    for move in game.legal_moves():
+        game.push(move)
+        counts[SQUARE_NAMES[move[0]] + SQUARE_NAMES[move[1]]] = perft(game, depth - 1)
+        game.pop()
+    return counts
+
+
+def count_attacker_mismatches(game, depth):
+    """
+    Return number of (square, team) pairs, over the positions of the legal move tree of game up to depth plies deep,
+    for which JanggiGame.get_attackers differs from the pieces whose attacks (attacked_by_piece) include the square
+    """
+    squares = game.get_janggi_board().get_squares()
+    expected = ([[] for _ in range(90)], [[] for _ in range(90)])
+    for origin, piece in enumerate(squares):
+        if piece is not EMPTY:
+            for square in attacked_by_piece(origin, squares):
+                expected[piece.team][square].append(origin)
+    mismatches = 0
+    for team in (RED, BLUE):
+        for square in range(90):
+            if sorted(game.get_attackers(square, team)) != expected[team][square]:
+                mismatches += 1
+    if depth > 0:
+        for move in game.legal_moves():
+            game.push(move)
+            mismatches += count_attacker_mismatches(game, depth - 1)
+            game.pop()
+    return mismatches
+
+
+def count_bitboard_mismatches(game, depth):
+    """
+    Return number of (position, team) pairs, over the legal move tree of game up to depth plies deep, for which the
+    bitboard of the game disagrees with the attack map on the squares attacked by the team, or with the destinations of
+    the team's pieces on the squares it can move to. The bitboard and attack map are enabled on game, and kept in sync
+    by push and pop.
+    """
+    bitboard = game.enable_bitboard()
+    attack_map = game.enable_attack_map()
+    board = game.get_janggi_board()
+    mismatches = 0
+    for team in (RED, BLUE):
+        counts = attack_map.get_attack_counts(team)
+        destinations = set()
+        for square, piece in enumerate(board.get_squares()):
+            if piece is not EMPTY and piece.team == team:
+                destinations.update(piece.destinations(square, board))
+        attacked = [square for square in range(90) if counts[square]]
+        if list(mask_to_squares(bitboard.attacked_squares(team))) != attacked or \
+                set(mask_to_squares(bitboard.movable_squares(team))) != destinations:
+            mismatches += 1
+    if depth > 0:
+        for move in game.legal_moves():
+            game.push(move)
+            mismatches += count_bitboard_mismatches(game, depth - 1)
+            game.pop()
+    return mismatches
+
+
+def main():
+    """Run perft on the chosen positions, printing counts, nodes per second and mismatches with reference counts"""
+    parser = argparse.ArgumentParser(description='Perft node counts and speed for the Janggi move generator')
+    parser.add_argument('--depth', type=int, default=3, help='maximum depth to count (default 3)')
+    parser.add_argument('--position', action='append', help='position name, may be repeated (default all)')
+    parser.add_argument('--divide', action='store_true', help='print counts per root move at the maximum depth')
+    parser.add_argument('--verify', action='store_true',
+                        help='only run depths with reference counts, exit 1 on a mismatch')
+    args = parser.parse_args()
+
+    positions = get_positions()
+    names = args.position or list(positions)
+    failures = 0
+    total_nodes = 0
+    total_time = 0.0
+    for name in names:
+        game = positions[name]()
+        reference = REFERENCE_COUNTS.get(name, ())
+        max_depth = min(args.depth, len(reference)) if args.verify else args.depth
+        for depth in range(1, max_depth + 1):
+            start_time = time.perf_counter()
+            nodes = perft(game, depth)
+            elapsed = time.perf_counter() - start_time
+            total_nodes += nodes
+            total_time += elapsed
+            status = ''
+            if depth <= len(reference):
+                if nodes == reference[depth - 1]:
+                    status = 'ok'
+                else:
+                    status = 'MISMATCH, expected ' + str(reference[depth - 1])
+                    failures += 1
+            print('{:<18} depth {} {:>10} nodes {:>8.2f}s {:>9.0f} nodes/s {}'.format(
+                name, depth, nodes, elapsed, nodes / elapsed if elapsed else 0, status))
+        if args.verify:
+            mismatches = count_attacker_mismatches(game, 1)
+            status = 'ok' if mismatches == 0 else 'MISMATCH in {} squares'.format(mismatches)
+            print('{:<18} attackers {}'.format(name, status))
+            failures += mismatches != 0
+            mismatches = count_bitboard_mismatches(game, 1)
+            game.disable_bitboard()
+            game.disable_attack_map()
+            status = 'ok' if mismatches == 0 else 'MISMATCH in {} positions'.format(mismatches)
+            print('{:<18} bitboard {}'.format(name, status))
+            failures += mismatches != 0
+        if args.divide:
+            for move, nodes in sorted(divide(game, max_depth).items()):
+                print('    ' + move, nodes)
+
+    if total_time:
+        print('total {} nodes in {:.2f}s, {:.0f} nodes/s'.format(total_nodes, total_time, total_nodes / total_time))
+    if failures:
+        print(failures, 'mismatches')
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
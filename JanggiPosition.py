@@ -0,0 +1,146 @@
+# Saving and loading Janggi positions. Two formats are supported:
+#  - FEN text, in the style used by common Janggi tools such as Fairy-Stockfish: ten ranks separated by '/', digits for
+#    runs of empty squares, uppercase for blue (Cho, moving first) and lowercase for red (Han), then the side to move
+#    ('w' for blue, 'b' for red), two unused '-' fields, the half move clock and the move number. Pieces are K general,
+#    A guard, N horse, B elephant, R chariot, C cannon and P soldier. The first rank of the FEN is row 1 of the board.
+#  - Packed binary, a fixed 46 bytes: 4 bits per square (0 empty, 1 + team code * 7 + piece type code otherwise), two
+#    squares per byte in square index order, followed by one byte for the side to move (0 blue, 1 red).
+
+from JanggiGame import JanggiGame, GameBoard, General, Guard, Horse, Elephant, Chariot, Cannon, Soldier
+from JanggiTables import EMPTY, RED
+
+# Piece classes indexed by piece type code
+PIECE_CLASSES = (General, Guard, Horse, Elephant, Chariot, Cannon, Soldier)
+PIECE_LETTERS = 'KANBRCP'
+
+# Pieces indexed by their 4 bit code, entry 0 is an empty square
+PIECE_CODES = (EMPTY,) + tuple(piece_class(team) for team in ('red', 'blue') for piece_class in PIECE_CLASSES)
+FEN_LETTERS = {piece: letter.lower() if piece.team == RED else letter
+               for piece, letter in zip(PIECE_CODES[1:], PIECE_LETTERS * 2)}
+FEN_PIECES = {letter: piece for piece, letter in FEN_LETTERS.items()}
+
+PACKED_BOARD_SIZE = 45
+PACKED_POSITION_SIZE = 46
+
+# Byte pairs of squares to 4 bit codes, for unpacking without arithmetic per square
+_BYTE_TO_PIECES = tuple((PIECE_CODES[byte >> 4] if byte >> 4 < 15 else EMPTY,
+                         PIECE_CODES[byte & 15] if byte & 15 < 15 else EMPTY) for byte in range(256))
+
+
+def _piece_code(piece):
+    """Return the 4 bit code of a square's contents"""
+    if piece is EMPTY:
+        return 0
+    return 1 + piece.team * 7 + piece.kind
+
+
+def board_to_fen(board):
+    """Return the piece placement field of the FEN of a GameBoard"""
+    squares = board.get_squares()
+    ranks = []
+    for row in range(10):
+        rank = ''
+        empty = 0
+        for piece in squares[row * 9:row * 9 + 9]:
+            if piece is EMPTY:
+                empty += 1
+                continue
+            if empty:
+                rank += str(empty)
+                empty = 0
+            rank += FEN_LETTERS[piece]
+        if empty:
+            rank += str(empty)
+        ranks.append(rank)
+    return '/'.join(ranks)
+
+
+def fen_to_board(placement, board=None):
+    """Fill board (a new GameBoard if not given) from the piece placement field of a FEN and return it"""
+    if board is None:
+        board = GameBoard()
+    ranks = placement.split('/')
+    if len(ranks) != 10:
+        raise ValueError('FEN needs 10 ranks: ' + placement)
+    for row, rank in enumerate(ranks):
+        col = 0
+        for char in rank:
+            if char.isdigit():
+                for _ in range(int(char)):
+                    if col < 9:
+                        board.set_square_at(row * 9 + col, EMPTY)
+                    col += 1
+            elif char in FEN_PIECES and col < 9:
+                board.set_square_at(row * 9 + col, FEN_PIECES[char])
+                col += 1
+            else:
+                raise ValueError('bad FEN rank: ' + rank)
+        if col != 9:
+            raise ValueError('FEN rank needs 9 squares: ' + rank)
+    return board
+
+
+def get_fen(game):
+    """Return the FEN of the position of a JanggiGame"""
+    side = 'w' if game.get_player_turn() == 'blue' else 'b'
+    move_number = len(game.get_move_history()) // 2 + 1
+    return '{} {} - - 0 {}'.format(board_to_fen(game.get_janggi_board()), side, move_number)
+
+
+def game_from_fen(fen):
+    """
+    Return a new JanggiGame set up with the position of a FEN. Only the placement and side to move are used. Raises
+    ValueError for a malformed FEN or a position without exactly one general per team
+    """
+    fields = fen.split()
+    if not fields:
+        raise ValueError('empty FEN')
+    side = fields[1] if len(fields) > 1 else 'w'
+    if side not in ('w', 'b'):
+        raise ValueError('bad FEN side to move: ' + side)
+    game = JanggiGame()
+    game.set_janggi_board(fen_to_board(fields[0]), 'blue' if side == 'w' else 'red')
+    return game
+
+
+def pack_board(board):
+    """Return the 45 byte packed encoding of the squares of a GameBoard"""
+    codes = [_piece_code(piece) for piece in board.get_squares()]
+    return bytes([high << 4 | low for high, low in zip(codes[0::2], codes[1::2])])
+
+
+def unpack_board(data, board=None):
+    """Fill board (a new GameBoard if not given) from a packed board encoding and return it. Invalid codes are empty"""
+    if board is None:
+        board = GameBoard()
+    squares = board.get_squares()
+    set_square_at = board.set_square_at
+    square = 0
+    # Squares that already hold the right piece are left alone, so reusing a board for similar positions is cheap
+    for byte in data[:PACKED_BOARD_SIZE]:
+        first, second = _BYTE_TO_PIECES[byte]
+        if squares[square] is not first:
+            set_square_at(square, first)
+        if squares[square + 1] is not second:
+            set_square_at(square + 1, second)
+        square += 2
+    return board
+
+
+def pack_position(game):
+    """Return the 46 byte packed encoding of the position of a JanggiGame: the board and the side to move"""
+    return pack_board(game.get_janggi_board()) + (b'\x00' if game.get_player_turn() == 'blue' else b'\x01')
+
+
+def unpack_position(data, game=None):
+    """
+    Set up game (a new JanggiGame if not given) with a packed position and return it. Raises ValueError for data of the
+    wrong size or a position without exactly one general per team, in which case the board of game may already have
+    been changed
+    """
+    if len(data) != PACKED_POSITION_SIZE:
+        raise ValueError('packed position must be {} bytes'.format(PACKED_POSITION_SIZE))
+    if game is None:
+        game = JanggiGame()
+    game.set_janggi_board(unpack_board(data, game.get_janggi_board()), 'blue' if data[-1] == 0 else 'red')
+    return game
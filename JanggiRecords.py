@@ -0,0 +1,223 @@
+# Reading and replaying Janggi game records. Records are streamed line by line from files of any size, one game at a
+# time, in either of two formats:
+#  - a simple move list: optional [Tag "value"] lines, then moves as from and to locations ('e7e6' or 'e7-e6'), 'pass'
+#    for a pass, move numbers ('1.') are ignored, and an optional result ('1-0' blue won, '0-1' red won, '*').
+#    [Setup "left-right"] gives the horse/elephant swaps of blue and red (see JanggiGame.swap_horse_elephant), and
+#    [FEN "..."] a start position (see JanggiPosition).
+#  - GIB Korean game records: [Key "value"] header lines such as [초차림 "상마상마"], [한차림 "마상상마"] and
+#    [대국결과 "초 완승"], then numbered moves such as '1. 79졸78', where the digits are the row (0 for 10) and column
+#    (1 for a) of the from and to squares, and '한수쉼' is a pass. Setups are read by columns a to i.
+# Games are separated by a blank line after the moves or by the tags of the next game.
+#
+# The replay validator plays each game with JanggiGame.push, checking moves against legal_moves_from, which only plays
+# out moves that can affect the general, instead of the full check and checkmate detection of make_move. Checkmate is
+# only tested once, at the end of the game.
+#
+# Usage: python JanggiRecords.py FILE [FILE ...] [--encoding ENCODING] [--batch-size N] [--quiet]
+
+import argparse
+from collections import namedtuple
+import re
+import sys
+from JanggiGame import JanggiGame
+from JanggiPosition import game_from_fen
+from JanggiTables import EMPTY, TEAM_CODES, PIECE_TYPE_CODES, SQUARE_INDEX, BOARD_COLUMNS
+
+GameRecord = namedtuple('GameRecord', ['index', 'tags', 'moves', 'result'])
+ReplayResult = namedtuple('ReplayResult', ['index', 'plies', 'captures', 'checks', 'passes', 'status', 'result',
+                                           'error'])
+
+# Moves are (from_location, to_location, piece type or None), or None for a pass
+SIMPLE_MOVE = re.compile(r'^([a-i](?:10|[1-9]))-?([a-i](?:10|[1-9]))$')
+GIB_MOVE = re.compile(r'^(\d)(\d)(\D+)(\d)(\d)$')
+MOVE_NUMBER = re.compile(r'^\d+\.+$')
+PASS_TOKENS = ('pass', '--', '한수쉼')
+RESULT_TOKENS = {'1-0': 'BLUE_WON', '0-1': 'RED_WON', '*': None}
+TAG_LINE = re.compile(r'^\[\s*([^\s"]+)\s+"(.*)"\s*\]$')
+
+GIB_PIECE_TYPES = {'졸': 'Soldier', '병': 'Soldier', '卒': 'Soldier', '兵': 'Soldier', '차': 'Chariot', '車': 'Chariot',
+                   '포': 'Cannon', '包': 'Cannon', '砲': 'Cannon', '마': 'Horse', '馬': 'Horse', '상': 'Elephant',
+                   '象': 'Elephant', '사': 'Guard', '士': 'Guard', '장': 'General', '궁': 'General', '將': 'General',
+                   '帥': 'General', '漢': 'General', '楚': 'General'}
+# GIB setups by columns a to i, mapped to the side argument of JanggiGame.swap_horse_elephant
+GIB_SETUPS = {'상마상마': 'neither', '마상상마': 'left', '상마마상': 'right', '마상마상': 'both'}
+
+
+def _gib_location(row, col):
+    """Return the location of GIB row and column digits, row 0 being row 10"""
+    return BOARD_COLUMNS[int(col) - 1] + str(int(row) or 10)
+
+
+def parse_move(token):
+    """
+    Return the move of a move text token: (from_location, to_location, piece type or None), None for a pass, or False
+    if the token is not a move
+    """
+    if token in PASS_TOKENS:
+        return None
+    match = SIMPLE_MOVE.match(token)
+    if match:
+        return match.group(1), match.group(2), None
+    match = GIB_MOVE.match(token)
+    if match and match.group(3) in GIB_PIECE_TYPES and match.group(2) != '0' and match.group(5) != '0':
+        return (_gib_location(match.group(1), match.group(2)), _gib_location(match.group(4), match.group(5)),
+                GIB_PIECE_TYPES[match.group(3)])
+    return False
+
+
+def read_games(lines):
+    """
+    Generator of GameRecords from an iterable of lines (such as an open file), one game at a time. Tokens that are
+    neither moves, move numbers nor results are kept in the '_unparsed' tag
+    """
+    index = 0
+    tags = {}
+    moves = []
+    result = None
+    for line in lines:
+        line = line.strip()
+        tag = TAG_LINE.match(line)
+        if moves and (tag or not line):
+            yield GameRecord(index, tags, moves, result)
+            index += 1
+            tags = {}
+            moves = []
+            result = None
+        if tag:
+            tags[tag.group(1)] = tag.group(2)
+            continue
+        for token in line.split():
+            if MOVE_NUMBER.match(token):
+                continue
+            if token in RESULT_TOKENS:
+                result = RESULT_TOKENS[token]
+                continue
+            move = parse_move(token)
+            if move is False:
+                tags['_unparsed'] = tags.get('_unparsed', '') + token + ' '
+            else:
+                moves.append(move)
+    if moves or tags:
+        yield GameRecord(index, tags, moves, result)
+
+
+def read_game_file(path, encoding='utf-8'):
+    """Generator of GameRecords streamed from a file. Korean GIB files are often encoded as 'cp949'"""
+    with open(path, encoding=encoding, errors='replace') as file:
+        yield from read_games(file)
+
+
+def record_result(record):
+    """Return the result of a GameRecord as 'BLUE_WON', 'RED_WON' or None, from its result token or GIB result tag"""
+    if record.result is not None:
+        return record.result
+    gib_result = record.tags.get('대국결과', '')
+    if gib_result.startswith('초'):
+        return 'BLUE_WON'
+    if gib_result.startswith('한'):
+        return 'RED_WON'
+    return None
+
+
+def start_game(record):
+    """Return a JanggiGame set up with the start position of a GameRecord"""
+    if 'FEN' in record.tags:
+        return game_from_fen(record.tags['FEN'])
+    game = JanggiGame()
+    if 'Setup' in record.tags:
+        blue_side, red_side = record.tags['Setup'].split('-')
+    else:
+        blue_side = GIB_SETUPS.get(record.tags.get('초차림'), 'neither')
+        red_side = GIB_SETUPS.get(record.tags.get('한차림'), 'neither')
+    game.swap_horse_elephant('blue', blue_side)
+    game.swap_horse_elephant('red', red_side)
+    return game
+
+
+def replay(record):
+    """
+    Replay a GameRecord and return a ReplayResult: plies played, captures, moves giving check, passes, the final
+    status ('BLUE_WON'/'RED_WON' on checkmate, otherwise 'UNFINISHED', or 'ILLEGAL'), the recorded result and a
+    description of the first illegal move, if any
+    """
+    try:
+        game = start_game(record)
+    except (ValueError, KeyError) as error:
+        return ReplayResult(record.index, 0, 0, 0, 0, 'ILLEGAL', record_result(record), 'bad start position: ' +
+                            str(error))
+    board = game.get_janggi_board()
+    captures = checks = passes = 0
+    for ply, move in enumerate(record.moves):
+        team = TEAM_CODES[game.get_player_turn()]
+        if move is None:
+            if game.is_in_check(team):
+                return ReplayResult(record.index, ply, captures, checks, passes, 'ILLEGAL', record_result(record),
+                                    'ply {}: pass while in check'.format(ply + 1))
+            game.push(None)
+            passes += 1
+            continue
+        from_location, to_location, piece_type = move
+        from_square = SQUARE_INDEX[from_location]
+        to_square = SQUARE_INDEX[to_location]
+        piece = board.get_square_at(from_square)
+        if piece is EMPTY or piece.team != team or \
+                piece_type is not None and piece.kind != PIECE_TYPE_CODES[piece_type] or \
+                to_square not in game.legal_moves_from(from_square):
+            return ReplayResult(record.index, ply, captures, checks, passes, 'ILLEGAL', record_result(record),
+                                'ply {}: {}{}'.format(ply + 1, from_location, to_location))
+        if board.get_square_at(to_square) is not EMPTY:
+            captures += 1
+        game.push((from_square, to_square))
+        if game.is_in_check(game.get_player_turn()):
+            checks += 1
+
+    status = 'UNFINISHED'
+    team = game.get_player_turn()
+    if checks and game.is_in_check(team) and game.is_in_checkmate(team):
+        status = 'RED_WON' if team == 'blue' else 'BLUE_WON'
+    return ReplayResult(record.index, len(record.moves), captures, checks, passes, status, record_result(record), None)
+
+
+def replay_batches(records, batch_size=1000):
+    """Generator of lists of up to batch_size ReplayResults, replaying the GameRecords of records in order"""
+    batch = []
+    for record in records:
+        batch.append(replay(record))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main():
+    """Replay game record files, printing one tab separated line per game and a summary"""
+    parser = argparse.ArgumentParser(description='Replay and validate Janggi game records (move lists or GIB)')
+    parser.add_argument('files', nargs='+', help='game record files')
+    parser.add_argument('--encoding', default='utf-8', help="file encoding (default utf-8, GIB files often 'cp949')")
+    parser.add_argument('--batch-size', type=int, default=1000, help='games per batch of output (default 1000)')
+    parser.add_argument('--quiet', action='store_true', help='only print the summary')
+    args = parser.parse_args()
+
+    totals = {'games': 0, 'plies': 0, 'illegal': 0, 'checkmates': 0, 'mismatched': 0}
+    for path in args.files:
+        for batch in replay_batches(read_game_file(path, args.encoding), args.batch_size):
+            lines = []
+            for result in batch:
+                totals['games'] += 1
+                totals['plies'] += result.plies
+                if result.status == 'ILLEGAL':
+                    totals['illegal'] += 1
+                elif result.status != 'UNFINISHED':
+                    totals['checkmates'] += 1
+                    if result.result is not None and result.result != result.status:
+                        totals['mismatched'] += 1
+                lines.append('\t'.join(str(value) for value in (path,) + tuple(result)))
+            if not args.quiet:
+                sys.stdout.write('\n'.join(lines) + '\n')
+    print('{games} games, {plies} plies, {illegal} with illegal moves, {checkmates} ending in checkmate, '
+          '{mismatched} checkmates against the recorded result'.format(**totals))
+
+
+if __name__ == '__main__':
+    main()
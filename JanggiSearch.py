@@ -0,0 +1,456 @@
+# Search engine for the Janggi AI: negamax alpha-beta with iterative deepening over JanggiGame.push/pop, backed by a
+# transposition table keyed by the Zobrist keys maintained by JanggiGame.
+
+from collections import namedtuple
+import time
+from JanggiTables import EMPTY, TEAM_CODES
+from JanggiEval import MATERIAL_VALUES, evaluate
+
+# Score bounds stored in the transposition table
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+
+class TranspositionTable:
+    """
+    Fixed size transposition table keyed by 64 bit Zobrist keys. Each slot holds one entry of key, depth, score, bound,
+    best move and search generation. Replacement is depth preferred: an entry from the current search is only replaced
+    by a search of equal or greater depth.
+    """
+    def __init__(self, size=1 << 20):
+        """Init table with size slots, rounded down to a power of two so slots can be found with a bit mask"""
+        size = max(1, size)
+        size = 1 << (size.bit_length() - 1)
+        self._entries = [None] * size
+        self._mask = size - 1
+        self._generation = 0
+
+    def __len__(self):
+        """Return number of slots in the table"""
+        return len(self._entries)
+
+    def new_search(self):
+        """Start a new search generation. Entries from earlier searches can then be replaced regardless of depth"""
+        self._generation += 1
+
+    def clear(self):
+        """Remove all entries from the table"""
+        self._entries = [None] * len(self._entries)
+
+    def probe(self, key):
+        """Return (depth, score, bound, move) stored for key, or None if the key is not in the table"""
+        entry = self._entries[key & self._mask]
+        if entry is not None and entry[0] == key:
+            return entry[1:5]
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        """Store a search result for key, unless the slot holds a deeper result from the current search"""
+        index = key & self._mask
+        entry = self._entries[index]
+        if entry is None or depth >= entry[1] or entry[5] != self._generation:
+            self._entries[index] = (key, depth, score, bound, move, self._generation)
+
+    def get_best_move(self, key):
+        """Return the best move stored for key, or None"""
+        entry = self._entries[key & self._mask]
+        if entry is not None and entry[0] == key:
+            return entry[4]
+        return None
+
+
+# Piece values used by move ordering, static exchange evaluation and the plain material evaluation, indexed by piece
+# type code (General, Guard, Horse, Elephant, Chariot, Cannon, Soldier). The same scale as the evaluation in JanggiEval,
+# with the general worth more than everything else
+PIECE_VALUES = (1000,) + MATERIAL_VALUES[1:]
+
+# Scores at or beyond MATE_BOUND are mates, MATE_SCORE - ply is a mate found ply half moves from the root
+MATE_SCORE = 100000
+MATE_BOUND = MATE_SCORE - 1000
+INFINITY = MATE_SCORE + 1
+
+# Number of nodes between checks of the time budget and the stop flag. The node budget is checked on every node
+CHECK_INTERVAL = 1024
+NO_NODE_LIMIT = float('inf')
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the node or time budget is spent, unwinding to the root"""
+    pass
+
+
+SearchResult = namedtuple('SearchResult', ['move', 'score', 'depth', 'nodes', 'time', 'pv'])
+
+# MVV-LVA capture scores indexed by [victim type code][attacker type code]: the most valuable victim first, and between
+# equal victims the least valuable attacker first
+MVV_LVA = tuple(tuple(victim_value * 16 - attacker_value // 10 for attacker_value in PIECE_VALUES)
+                for victim_value in PIECE_VALUES)
+
+
+class MoveOrderer:
+    """
+    Move ordering for alpha-beta searches over a JanggiGame. Keeps two killer moves per ply (quiet moves that caused a
+    beta cutoff at that ply) and a history table scoring quiet moves by the piece moved and its destination. Moves are
+    handed out by a staged generator: the hash move, then captures by MVV-LVA, then killers, then the remaining quiet
+    moves by history score. Later stages are only sorted if the search gets that far.
+    """
+    def __init__(self):
+        """Init MoveOrderer with no killers and an empty history table"""
+        self._killers = []
+        # History scores indexed by (team code * 7 + piece type code) * 90 + destination square
+        self._history = [0] * (14 * 90)
+
+    def new_search(self):
+        """Prepare for a new search: forget the killers and age the history scores"""
+        self._killers = []
+        self._history = [score // 2 for score in self._history]
+
+    def clear(self):
+        """Forget all killers and history"""
+        self._killers = []
+        self._history = [0] * (14 * 90)
+
+    def get_killers(self, ply):
+        """Return list of the killer moves stored for ply, most recent first"""
+        if ply < len(self._killers):
+            return [move for move in self._killers[ply] if move is not None]
+        return []
+
+    def get_history(self, piece, to_square):
+        """Return the history score of piece (a GamePiece) moving to to_square"""
+        return self._history[(piece.team * 7 + piece.kind) * 90 + to_square]
+
+    def record_cutoff(self, game, move, depth, ply):
+        """
+        Record that move caused a beta cutoff at ply with depth plies left. Must be called with the position before
+        move. Captures are already ordered well by MVV-LVA, so only quiet moves update the killers and history.
+        """
+        squares = game.get_janggi_board().get_squares()
+        from_square, to_square = move
+        if squares[to_square] is not EMPTY:
+            return
+        while len(self._killers) <= ply:
+            self._killers.append([None, None])
+        killers = self._killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        piece = squares[from_square]
+        self._history[(piece.team * 7 + piece.kind) * 90 + to_square] += depth * depth
+
+    def order_moves(self, game, moves, ply, hash_move=None):
+        """
+        Generator of moves (a list of (from_square, to_square) tuples for the position of game) in search order. The
+        position must be the same each time the generator resumes, so moves have to be taken back before the next one
+        is requested.
+        """
+        squares = game.get_janggi_board().get_squares()
+        captures = []
+        quiets = []
+        for move in moves:
+            if move == hash_move:
+                continue
+            if squares[move[1]] is EMPTY:
+                quiets.append(move)
+            else:
+                captures.append(move)
+        if hash_move is not None and (len(captures) + len(quiets)) < len(moves):
+            yield hash_move
+
+        captures.sort(key=lambda move: MVV_LVA[squares[move[1]].kind][squares[move[0]].kind], reverse=True)
+        yield from captures
+
+        killers = [move for move in self.get_killers(ply) if move in quiets]
+        yield from killers
+
+        history = self._history
+        quiets = [move for move in quiets if move not in killers]
+        quiets.sort(key=lambda move: history[(squares[move[0]].team * 7 + squares[move[0]].kind) * 90 + move[1]],
+                    reverse=True)
+        yield from quiets
+
+
+def evaluate_material(game, alpha=None, beta=None):
+    """Return material balance of game from the point of view of the player to move. The search window is not used"""
+    team = TEAM_CODES[game.get_player_turn()]
+    score = 0
+    for value in game.get_janggi_board().get_squares():
+        if value is not EMPTY:
+            if value.team == team:
+                score += PIECE_VALUES[value.kind]
+            else:
+                score -= PIECE_VALUES[value.kind]
+    return score
+
+
+def static_exchange(game, move):
+    """
+    Static exchange evaluation of move, a capture by the player to move. Returns the material the player to move wins
+    (negative if it loses material) when both sides keep recapturing on the destination square with their least
+    valuable attacker for as long as it pays. The exchange is played out on the board with push/pop, so pieces coming
+    off are handled by the normal Janggi rules: cannons need a non cannon screen and cannot capture cannons, a piece
+    leaving can free horse and elephant legs or open a line (including palace diagonals) for a chariot or cannon behind
+    it, and can also take away the screen of a cannon. Whether a recapture leaves its general in check is ignored.
+    """
+    squares = game.get_janggi_board().get_squares()
+    gain = PIECE_VALUES[squares[move[1]].kind]
+    game.push(move)
+    gain -= _exchange(game, move[1])
+    game.pop()
+    return gain
+
+
+def _exchange(game, square):
+    """Return what the player to move gains by recapturing on square with the least valuable attacker, at least 0"""
+    squares = game.get_janggi_board().get_squares()
+    attackers = game.get_attackers(square, game.get_player_turn())
+    if not attackers:
+        return 0
+    attacker = min(attackers, key=lambda origin: PIECE_VALUES[squares[origin].kind])
+    gain = PIECE_VALUES[squares[square].kind]
+    game.push((attacker, square))
+    gain -= _exchange(game, square)
+    game.pop()
+    return max(0, gain)
+
+
+def score_to_table(score, ply):
+    """Convert a mate score relative to the root into one relative to the current node, for storing in the table"""
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """Convert a mate score stored in the table back into one relative to the root"""
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class Searcher:
+    """
+    Negamax alpha-beta search with iterative deepening over a JanggiGame. Moves are played with JanggiGame.push/pop and
+    only legal moves are searched. Positions are cached in a TranspositionTable keyed by Zobrist key. The search stops
+    when the node or time budget is spent and returns the result of the deepest completed iteration.
+    """
+    def __init__(self, game, transposition_table=None, evaluate=evaluate, move_orderer=None):
+        """Init Searcher for game, with an optional shared transposition table, evaluation function and move orderer"""
+        self._game = game
+        if transposition_table is None:
+            transposition_table = TranspositionTable()
+        self._table = transposition_table
+        self._evaluate = evaluate
+        if move_orderer is None:
+            move_orderer = MoveOrderer()
+        self._move_orderer = move_orderer
+        self._nodes = 0
+        # Node budget of the running search, infinite if there is none, so it can be compared on every node
+        self._node_limit = NO_NODE_LIMIT
+        self._deadline = None
+        self._stopped = False
+        self._pv_table = []
+
+    def get_nodes(self):
+        """Return number of nodes visited by the last search"""
+        return self._nodes
+
+    def stop(self):
+        """
+        Stop the running search, and any later search of this Searcher, at the next check of the budget. Can be called
+        from another thread, the search then returns the result of the deepest completed iteration.
+        """
+        self._stopped = True
+
+    def search(self, max_depth=64, node_limit=None, time_limit=None, callback=None):
+        """
+        Search the position of the game for the player to move. Stops after max_depth, or once node_limit nodes have
+        been visited or time_limit seconds have passed. callback, if given, is called with the SearchResult of each
+        completed iteration. Returns a SearchResult, whose move is None if the player to move has no legal moves.
+        """
+        game = self._game
+        start_time = time.perf_counter()
+        self._nodes = 0
+        self._node_limit = NO_NODE_LIMIT if node_limit is None else node_limit
+        self._deadline = None if time_limit is None else start_time + time_limit
+        self._table.new_search()
+        self._move_orderer.new_search()
+
+        root_moves = game.legal_moves()
+        if not root_moves:
+            return SearchResult(None, 0, 0, 0, 0.0, [])
+        result = SearchResult(root_moves[0], 0, 0, 0, 0.0, [root_moves[0]])
+        undo_depth = len(game.get_move_history())
+
+        for depth in range(1, max_depth + 1):
+            if self._stopped:
+                break
+            self._pv_table = [[] for _ in range(depth + 2)]
+            try:
+                score = self._negamax(depth, -INFINITY, INFINITY, 0)
+            except SearchTimeout:
+                # Unwind moves left on the board by the interrupted iteration
+                while len(game.get_move_history()) > undo_depth:
+                    game.pop()
+                break
+            pv = self._pv_table[0] or [result.move]
+            result = SearchResult(pv[0], score, depth, self._nodes, time.perf_counter() - start_time, pv)
+            if callback is not None:
+                callback(result)
+            # No point searching deeper once a forced mate has been found
+            if abs(score) >= MATE_BOUND:
+                break
+
+        return result._replace(nodes=self._nodes, time=time.perf_counter() - start_time)
+
+    def search_move(self, move, depth, node_limit=None, time_limit=None, alpha=-INFINITY, beta=INFINITY):
+        """
+        Search a single root move: play move and search the resulting position depth - 1 plies deep within the window
+        (alpha, beta). Returns a SearchResult for move, scored from the point of view of the player making it (only a
+        bound if outside the window), or with a score of None if the node or time budget ran out first. Used to split
+        the root moves between parallel workers.
+        """
+        game = self._game
+        start_time = time.perf_counter()
+        self._nodes = 0
+        # Nothing to search once the search is stopped or out of time, the budget is otherwise only checked every
+        # CHECK_INTERVAL nodes
+        if self._stopped or time_limit is not None and time_limit <= 0:
+            return SearchResult(move, None, depth, 0, 0.0, [move])
+        self._node_limit = NO_NODE_LIMIT if node_limit is None else node_limit
+        self._deadline = None if time_limit is None else start_time + time_limit
+        self._pv_table = [[] for _ in range(depth + 2)]
+        undo_depth = len(game.get_move_history())
+
+        game.push(move)
+        try:
+            score = -self._negamax(depth - 1, -beta, -alpha, 1)
+        except SearchTimeout:
+            score = None
+        while len(game.get_move_history()) > undo_depth:
+            game.pop()
+        return SearchResult(move, score, depth, self._nodes, time.perf_counter() - start_time,
+                            [move] + self._pv_table[1])
+
+    def _check_budget(self):
+        """Raise SearchTimeout if the time budget is spent or the search was stopped"""
+        if self._stopped:
+            raise SearchTimeout()
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise SearchTimeout()
+
+    def _negamax(self, depth, alpha, beta, ply):
+        """Return score of the position for the player to move, searched depth plies deep within (alpha, beta)"""
+        game = self._game
+        self._nodes += 1
+        if self._nodes >= self._node_limit:
+            raise SearchTimeout()
+        if self._nodes % CHECK_INTERVAL == 0:
+            self._check_budget()
+        self._pv_table[ply] = []
+
+        key = game.get_zobrist_key()
+        hash_move = None
+        entry = self._table.probe(key)
+        if entry is not None:
+            entry_depth, entry_score, entry_bound, hash_move = entry
+            if ply > 0 and entry_depth >= depth:
+                entry_score = score_from_table(entry_score, ply)
+                if entry_bound == EXACT or \
+                        entry_bound == LOWER_BOUND and entry_score >= beta or \
+                        entry_bound == UPPER_BOUND and entry_score <= alpha:
+                    return entry_score
+
+        if depth <= 0:
+            return self._quiescence(alpha, beta, ply)
+
+        moves = game.legal_moves()
+        if not moves:
+            team = game.get_player_turn()
+            if game.is_in_check(team):
+                return -MATE_SCORE + ply
+            # Not in check but unable to move, the player passes
+            game.push(None)
+            score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            game.pop()
+            return score
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        for move in self._move_orderer.order_moves(game, moves, ply, hash_move):
+            game.push(move)
+            score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            game.pop()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    self._pv_table[ply] = [move] + self._pv_table[ply + 1]
+                    if alpha >= beta:
+                        self._move_orderer.record_cutoff(game, move, depth, ply)
+                        break
+
+        if best_score <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_score >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self._table.store(key, depth, score_to_table(best_score, ply), bound, best_move)
+        return best_score
+
+    def _quiescence(self, alpha, beta, ply):
+        """
+        Return score of the position for the player to move, searching only captures until the position is quiet, so
+        the evaluation is never taken in the middle of an exchange. The player to move may stand pat on the evaluation
+        instead of capturing. Captures that lose material by static exchange evaluation are not searched. While in
+        check every legal move is searched, and there is no standing pat.
+        """
+        game = self._game
+        self._nodes += 1
+        if self._nodes >= self._node_limit:
+            raise SearchTimeout()
+        if self._nodes % CHECK_INTERVAL == 0:
+            self._check_budget()
+
+        squares = game.get_janggi_board().get_squares()
+        team = game.get_player_turn()
+        in_check = game.is_in_check(team)
+        if in_check:
+            moves = game.legal_moves()
+            if not moves:
+                return -MATE_SCORE + ply
+            best_score = -INFINITY
+        else:
+            best_score = self._evaluate(game, alpha, beta)
+            if best_score >= beta:
+                return best_score
+            if best_score > alpha:
+                alpha = best_score
+            # A capture of a piece worth at least the capturing piece cannot lose material, only the rest need SEE
+            moves = [move for move in game.iter_moves(team) if squares[move[1]] is not EMPTY and (
+                PIECE_VALUES[squares[move[1]].kind] >= PIECE_VALUES[squares[move[0]].kind] or
+                static_exchange(game, move) >= 0)]
+
+        for move in self._move_orderer.order_moves(game, moves, ply):
+            # Captures are not checked for legality until they are searched
+            if not in_check and not game.is_safe_move(*move):
+                continue
+            game.push(move)
+            score = -self._quiescence(-beta, -alpha, ply + 1)
+            game.pop()
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        return best_score
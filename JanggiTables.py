@@ -0,0 +1,177 @@
+# Board geometry and precomputed move tables for Janggi. Everything here is built once at import, so piece move
+# generation reduces to table lookups plus occupancy tests.
+
+import random
+
+
+# Board geometry. Internally squares are addressed by integer indexes 0-89, counted rank by rank from a1 (0) to
+# i10 (89), so square index = (row - 1) * 9 + column index. String locations like 'e10' are only used at the edges.
+BOARD_COLUMNS = ('a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i')
+SQUARE_NAMES = tuple(col + str(row) for row in range(1, 11) for col in BOARD_COLUMNS)
+SQUARE_INDEX = {name: index for index, name in enumerate(SQUARE_NAMES)}
+EMPTY = '__'
+
+# Small int codes for teams and piece types, used internally in place of the 'red'/'blue' and piece type strings.
+# TEAM_CODES and PIECE_TYPE_CODES accept either form, so methods taking a team or type work with both. The opposing
+# team of code t is 1 - t
+RED = 0
+BLUE = 1
+TEAMS = ('red', 'blue')
+TEAM_CODES = {'red': RED, 'blue': BLUE, RED: RED, BLUE: BLUE}
+GENERAL, GUARD, HORSE, ELEPHANT, CHARIOT, CANNON, SOLDIER = range(7)
+PIECE_TYPES = ('General', 'Guard', 'Horse', 'Elephant', 'Chariot', 'Cannon', 'Soldier')
+PIECE_TYPE_CODES = dict([(name, code) for code, name in enumerate(PIECE_TYPES)] + [(code, code) for code in range(7)])
+
+# Palace squares, and the palace squares connected by diagonal lines
+RED_PALACE = ('d1', 'e1', 'f1', 'd2', 'e2', 'f2', 'd3', 'e3', 'f3')
+BLUE_PALACE = ('d10', 'e10', 'f10', 'd9', 'e9', 'f9', 'd8', 'e8', 'f8')
+RED_DIAG_PALACE = ('d1', 'f1', 'e2', 'd3', 'f3')
+BLUE_DIAG_PALACE = ('d10', 'f10', 'e9', 'd8', 'f8')
+PALACE_SQUARES = (frozenset(SQUARE_INDEX[loc] for loc in RED_PALACE),
+                  frozenset(SQUARE_INDEX[loc] for loc in BLUE_PALACE))
+DIAG_PALACE_SQUARES = (frozenset(SQUARE_INDEX[loc] for loc in RED_DIAG_PALACE),
+                       frozenset(SQUARE_INDEX[loc] for loc in BLUE_DIAG_PALACE))
+BOTH_PALACE_SQUARES = PALACE_SQUARES[RED] | PALACE_SQUARES[BLUE]
+BOTH_DIAG_PALACE_SQUARES = DIAG_PALACE_SQUARES[RED] | DIAG_PALACE_SQUARES[BLUE]
+
+# Direction deltas (col_delta, row_delta) used by the line moving pieces. Diagonals only apply inside the palace
+ORTHOGONAL_DIRECTIONS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+DIAGONAL_DIRECTIONS = ((1, 1), (1, -1), (-1, -1), (-1, 1))
+
+# Soldiers move towards the enemy palace: red soldiers move up the board, blue soldiers move down
+SOLDIER_FORWARD = (1, -1)
+
+
+def offset_square(square, col_delta, row_delta):
+    """Return the square index col_delta columns and row_delta rows away from square, or None if off the board"""
+    col = square % 9 + col_delta
+    row = square // 9 + row_delta
+    if 0 <= col < 9 and 0 <= row < 10:
+        return row * 9 + col
+    return None
+
+
+def _build_ray(square, col_delta, row_delta, diagonal):
+    """Return tuple of squares walked from square in a direction, stopping at the board edge (or palace edge)"""
+    ray = []
+    next_square = offset_square(square, col_delta, row_delta)
+    while next_square is not None and (not diagonal or next_square in BOTH_PALACE_SQUARES):
+        ray.append(next_square)
+        next_square = offset_square(next_square, col_delta, row_delta)
+    return tuple(ray)
+
+
+def _build_orthogonal_rays(square):
+    """Return the up, right, down and left rays from a square, dropping empty rays at the board edge"""
+    return tuple(ray for ray in (_build_ray(square, col_delta, row_delta, False)
+                                 for col_delta, row_delta in ORTHOGONAL_DIRECTIONS) if ray)
+
+
+def _build_diagonal_rays(square):
+    """Return the palace diagonal rays from a square. Only diagonally connected palace squares have any"""
+    if square not in BOTH_DIAG_PALACE_SQUARES:
+        return ()
+    return tuple(ray for ray in (_build_ray(square, col_delta, row_delta, True)
+                                 for col_delta, row_delta in DIAGONAL_DIRECTIONS) if ray)
+
+
+def _build_horse_moves(square):
+    """Return (leg, destination) pairs for a horse. The horse is blocked if its leg square is occupied"""
+    moves = []
+    for col_delta, row_delta in ORTHOGONAL_DIRECTIONS:
+        leg = offset_square(square, col_delta, row_delta)
+        if leg is None:
+            continue
+        for side in (-1, 1):
+            move = offset_square(square, 2 * col_delta + side * row_delta, 2 * row_delta + side * col_delta)
+            if move is not None:
+                moves.append((leg, move))
+    return tuple(moves)
+
+
+def _build_elephant_moves(square):
+    """Return (leg, second leg, destination) triples for an elephant. Either occupied leg square blocks the move"""
+    moves = []
+    for col_delta, row_delta in ORTHOGONAL_DIRECTIONS:
+        leg = offset_square(square, col_delta, row_delta)
+        if leg is None:
+            continue
+        for side in (-1, 1):
+            second_leg = offset_square(square, 2 * col_delta + side * row_delta, 2 * row_delta + side * col_delta)
+            move = offset_square(square, 3 * col_delta + 2 * side * row_delta, 3 * row_delta + 2 * side * col_delta)
+            if second_leg is not None and move is not None:
+                moves.append((leg, second_leg, move))
+    return tuple(moves)
+
+
+def _build_palace_moves(square, team):
+    """Return destinations of a general or guard of a team. Diagonal steps need a diagonally connected square"""
+    palace_squares = PALACE_SQUARES[team]
+    if square not in palace_squares:
+        return ()
+    moves = []
+    for col_delta, row_delta in ORTHOGONAL_DIRECTIONS + DIAGONAL_DIRECTIONS:
+        move = offset_square(square, col_delta, row_delta)
+        if move in palace_squares and (
+                col_delta == 0 or row_delta == 0 or square in DIAG_PALACE_SQUARES[team]):
+            moves.append(move)
+    return tuple(moves)
+
+
+def _build_soldier_moves(square, team):
+    """Return destinations of a soldier of a team: sideways, forward, and forward diagonally in the enemy palace"""
+    forward = SOLDIER_FORWARD[team]
+    enemy_team = 1 - team
+    moves = [move for move in (offset_square(square, -1, 0), offset_square(square, 1, 0),
+                               offset_square(square, 0, forward)) if move is not None]
+    if square in DIAG_PALACE_SQUARES[enemy_team]:
+        moves.extend(move for move in (offset_square(square, 1, forward), offset_square(square, -1, forward))
+                     if move in PALACE_SQUARES[enemy_team])
+    return tuple(moves)
+
+
+# Per square move tables, indexed by square index (and first by team code where direction matters)
+ORTHOGONAL_RAYS = tuple(_build_orthogonal_rays(square) for square in range(90))
+DIAGONAL_RAYS = tuple(_build_diagonal_rays(square) for square in range(90))
+LINE_RAYS = tuple(ORTHOGONAL_RAYS[square] + DIAGONAL_RAYS[square] for square in range(90))
+HORSE_MOVES = tuple(_build_horse_moves(square) for square in range(90))
+ELEPHANT_MOVES = tuple(_build_elephant_moves(square) for square in range(90))
+PALACE_MOVES = tuple(tuple(_build_palace_moves(square, team) for square in range(90)) for team in (RED, BLUE))
+SOLDIER_MOVES = tuple(tuple(_build_soldier_moves(square, team) for square in range(90)) for team in (RED, BLUE))
+
+
+def _build_reverse_table(move_table, origin_index):
+    """
+    Invert a per square move table. For each target square returns tuples of the origin square followed by the
+    blocking squares of every move in move_table that lands on the target.
+    """
+    reverse_table = [[] for _ in range(90)]
+    for origin in range(90):
+        for move in move_table[origin]:
+            blockers = move[:origin_index]
+            reverse_table[move[origin_index]].append((origin,) + blockers)
+    return tuple(tuple(entries) for entries in reverse_table)
+
+
+# Reverse tables used for attack detection, indexed by the attacked square. Horse entries are (origin, leg), elephant
+# entries are (origin, leg, second leg), soldier entries are origin squares
+HORSE_ATTACKS = _build_reverse_table(HORSE_MOVES, 1)
+ELEPHANT_ATTACKS = _build_reverse_table(ELEPHANT_MOVES, 2)
+SOLDIER_ATTACKS = tuple(tuple(tuple(origin for origin in range(90) if target in SOLDIER_MOVES[team][origin])
+                              for target in range(90)) for team in (RED, BLUE))
+
+# Origins of the horses and elephants whose moves are blocked by a piece on a square, indexed by that leg square
+HORSE_LEG_ORIGINS = tuple(tuple(origin for origin in range(90) if any(leg == square for leg, _ in HORSE_MOVES[origin]))
+                          for square in range(90))
+ELEPHANT_LEG_ORIGINS = tuple(tuple(origin for origin in range(90)
+                                   if any(square in legs[:2] for legs in ELEPHANT_MOVES[origin]))
+                             for square in range(90))
+
+
+# Zobrist keys. One random 64 bit key per team, piece type and square (indexed by team code, piece type code and
+# square), plus one for red to move. A fixed seed keeps keys identical across processes, so position keys can be shared
+# between workers and stored on disk
+_zobrist_random = random.Random(20210222)
+ZOBRIST_PIECE_KEYS = tuple(tuple(tuple(_zobrist_random.getrandbits(64) for _ in range(90)) for _ in PIECE_TYPES)
+                           for _ in TEAMS)
+ZOBRIST_RED_TURN_KEY = _zobrist_random.getrandbits(64)
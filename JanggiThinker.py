@@ -0,0 +1,82 @@
+# Background thinking for the Janggi AI. The search runs in a worker thread on its own copy of the position, so the GUI
+# keeps handling input and drawing while the AI thinks, and can cancel the search when the user quits or resigns. The
+# GUI thread spends its time waiting on the event queue, so the search gets almost all of the CPU.
+
+import threading
+from JanggiPosition import pack_position, unpack_position
+from JanggiSearch import Searcher, TranspositionTable, MoveOrderer
+
+
+class Thinker:
+    """
+    Searches a position in a background thread within a time and/or node budget. One search runs at a time; the
+    transposition table and move ordering statistics are kept between searches, as in JanggiGame.auto_move.
+
+    progress, if given, is called from the worker thread with the SearchResult of each completed iteration, and done
+    with the final SearchResult (not called if the search is cancelled). They should only hand the result over to the
+    caller's thread, for example by posting a pygame event.
+    """
+    def __init__(self, time_limit=1.0, node_limit=None, max_depth=64, progress=None, done=None):
+        """Init Thinker with the budget of each search and the optional progress and done callbacks"""
+        self._time_limit = time_limit
+        self._node_limit = node_limit
+        self._max_depth = max_depth
+        self._progress = progress
+        self._done = done
+        self._transposition_table = TranspositionTable()
+        self._move_orderer = MoveOrderer()
+        self._thread = None
+        self._searcher = None
+        self._result = None
+        self._cancelled = False
+
+    def start(self, game):
+        """
+        Start searching the position of game for the player to move. The position is copied, so game can be changed
+        while the search runs. Cancels the current search, if any.
+        """
+        self.cancel()
+        position = unpack_position(pack_position(game))
+        self._searcher = Searcher(position, self._transposition_table, move_orderer=self._move_orderer)
+        self._result = None
+        self._cancelled = False
+        self._thread = threading.Thread(target=self._run, args=(self._searcher,), daemon=True)
+        self._thread.start()
+
+    def _run(self, searcher):
+        """Worker thread: run the search and publish its result unless cancelled"""
+        result = searcher.search(self._max_depth, self._node_limit, self._time_limit, self._progress)
+        if not self._cancelled:
+            self._result = result
+            if self._done is not None:
+                self._done(result)
+
+    def cancel(self):
+        """Stop the current search, if any, and wait for the worker thread to finish. Its result is discarded"""
+        if self._thread is not None:
+            self._cancelled = True
+            self._searcher.stop()
+            self._thread.join()
+            self._thread = None
+            self._searcher = None
+
+    def is_thinking(self):
+        """Return True if a search has been started and its result is not available yet"""
+        return self._thread is not None and self._result is None
+
+    def get_result(self):
+        """
+        Return the SearchResult of the finished search (move None if the player to move has no legal moves), or None
+        while searching
+        """
+        return self._result
+
+    def take_result(self):
+        """Return the SearchResult of the finished search, as get_result, and forget the search"""
+        result = self._result
+        if result is not None:
+            self._thread.join()
+            self._thread = None
+            self._searcher = None
+            self._result = None
+        return result
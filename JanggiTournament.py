@@ -0,0 +1,180 @@
+# Self-play tournament runner for the Janggi AI. Plays engine A against engine B headless, without pygame, in a pool of
+# worker processes. Games start from each of the 16 horse/elephant setups with both engines taking each color in turn,
+# after a few seeded random opening moves so repeated setups give different games. Games that reach the ply limit, or
+# where both players pass in a row, are decided on official points. Reports the score of A with an Elo estimate and
+# 95% error bars, the average game length, and search speed.
+#
+# Usage: python JanggiTournament.py [--games N] [--workers N] [--engine-a SPEC] [--engine-b SPEC] [--max-plies N]
+#        [--random-plies N] [--seed N]
+# An engine SPEC is a comma separated list of nodes=N, time=SECONDS, depth=N and eval=full|material,
+# for example 'nodes=5000,eval=material'.
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import math
+import os
+import random
+import time
+from JanggiGame import JanggiGame
+from JanggiSearch import Searcher, TranspositionTable, MoveOrderer, evaluate_material
+from JanggiEval import evaluate, adjudicate_on_points
+
+SIDES = ('neither', 'left', 'right', 'both')
+SETUPS = tuple((blue_side, red_side) for blue_side in SIDES for red_side in SIDES)
+EVALUATIONS = {'full': evaluate, 'material': evaluate_material}
+DEFAULT_ENGINE = {'nodes': 2000, 'time': None, 'depth': 64, 'eval': 'full'}
+
+
+def parse_engine(spec):
+    """Return engine settings dict from a spec string such as 'nodes=5000,depth=6,eval=material'"""
+    engine = dict(DEFAULT_ENGINE)
+    for item in spec.split(','):
+        if not item:
+            continue
+        name, value = item.split('=')
+        if name == 'nodes':
+            engine['nodes'] = int(value) or None
+        elif name == 'time':
+            engine['time'] = float(value) or None
+        elif name == 'depth':
+            engine['depth'] = int(value)
+        elif name == 'eval' and value in EVALUATIONS:
+            engine['eval'] = value
+        else:
+            raise ValueError('bad engine setting: ' + item)
+    return engine
+
+
+def play_game(index, engines, max_plies, random_plies, seed):
+    """
+    Play game number index between engines ({'a': settings, 'b': settings}). The setup and colors follow from index,
+    engine A plays blue in even games. Returns a dict with the winner ('a' or 'b'), how the game ended, its length in
+    plies, and the nodes searched and seconds spent by both engines.
+    """
+    blue_side, red_side = SETUPS[index // 2 % len(SETUPS)]
+    teams = {'blue': 'a', 'red': 'b'} if index % 2 == 0 else {'blue': 'b', 'red': 'a'}
+    game = JanggiGame()
+    game.swap_horse_elephant('blue', blue_side)
+    game.swap_horse_elephant('red', red_side)
+
+    # Random opening moves, the same for both color assignments of a setup
+    rng = random.Random(seed * 1000003 + index // 2)
+    for _ in range(random_plies):
+        moves = game.legal_moves()
+        if not moves:
+            break
+        game.push(rng.choice(moves))
+
+    searchers = {}
+    for team, name in teams.items():
+        engine = engines[name]
+        searchers[team] = Searcher(game, TranspositionTable(1 << 18), EVALUATIONS[engine['eval']], MoveOrderer())
+    nodes = 0
+    search_time = 0.0
+    passes = 0
+    winner_team = None
+    reason = 'points'
+    while len(game.get_move_history()) < max_plies:
+        team = game.get_player_turn()
+        engine = engines[teams[team]]
+        result = searchers[team].search(engine['depth'], engine['nodes'], engine['time'])
+        nodes += result.nodes
+        search_time += result.time
+        if result.move is None:
+            if game.is_in_check(team):
+                winner_team = game.get_opposite_team()
+                reason = 'checkmate'
+                break
+            passes += 1
+            if passes == 2:
+                break
+            game.push(None)
+        else:
+            passes = 0
+            game.push(result.move)
+
+    if winner_team is None:
+        winner_team = 'red' if adjudicate_on_points(game) == 'RED_WON' else 'blue'
+    return {'winner': teams[winner_team], 'reason': reason, 'plies': len(game.get_move_history()), 'nodes': nodes,
+            'time': search_time}
+
+
+def elo_difference(score):
+    """Return the Elo difference matching a score fraction between 0 and 1"""
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def summarize(results):
+    """Return dict of tournament statistics for engine A from a list of play_game results"""
+    games = len(results)
+    wins = sum(1 for result in results if result['winner'] == 'a')
+    score = wins / games
+    # 95% confidence interval of the score, converted to Elo
+    margin = 1.96 * math.sqrt(score * (1 - score) / games)
+    nodes = sum(result['nodes'] for result in results)
+    search_time = sum(result['time'] for result in results)
+    return {
+        'games': games,
+        'wins': wins,
+        'losses': games - wins,
+        'checkmates': sum(1 for result in results if result['reason'] == 'checkmate'),
+        'score': score,
+        'elo': elo_difference(score),
+        'elo_low': elo_difference(score - margin),
+        'elo_high': elo_difference(score + margin),
+        'average_plies': sum(result['plies'] for result in results) / games,
+        'nodes_per_second': nodes / search_time if search_time else 0.0,
+    }
+
+
+def run_tournament(games, engines, workers=None, max_plies=200, random_plies=4, seed=1, progress=None):
+    """
+    Play games between engines in worker processes and return the list of play_game results, in game order. progress,
+    if given, is called with the number of finished games after each one.
+    """
+    results = [None] * games
+    with ProcessPoolExecutor(workers or os.cpu_count()) as executor:
+        futures = {executor.submit(play_game, index, engines, max_plies, random_plies, seed): index
+                   for index in range(games)}
+        finished = 0
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            finished += 1
+            if progress is not None:
+                progress(finished)
+    return results
+
+
+def main():
+    """Run a tournament from the command line and print the results for engine A"""
+    parser = argparse.ArgumentParser(description='Self-play tournament between two Janggi engine settings')
+    parser.add_argument('--games', type=int, default=64, help='number of games (default 64, two per setup)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default one per CPU)')
+    parser.add_argument('--engine-a', default='', help="engine A settings, e.g. 'nodes=5000,eval=full'")
+    parser.add_argument('--engine-b', default='', help="engine B settings, e.g. 'nodes=5000,eval=material'")
+    parser.add_argument('--max-plies', type=int, default=200, help='plies before a game is decided on points')
+    parser.add_argument('--random-plies', type=int, default=4, help='random opening plies per game (default 4)')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the random opening plies')
+    args = parser.parse_args()
+
+    engines = {'a': parse_engine(args.engine_a), 'b': parse_engine(args.engine_b)}
+    print('engine A:', engines['a'])
+    print('engine B:', engines['b'])
+    start_time = time.perf_counter()
+
+    def progress(finished):
+        if finished % 10 == 0 or finished == args.games:
+            print('{}/{} games'.format(finished, args.games), end='\r', flush=True)
+
+    results = run_tournament(args.games, engines, args.workers, args.max_plies, args.random_plies, args.seed, progress)
+    print()
+    summary = summarize(results)
+    print('A: {wins} wins, {losses} losses ({checkmates} checkmates), score {score:.3f}'.format(**summary))
+    print('Elo difference {elo:+.0f} (95% {elo_low:+.0f} to {elo_high:+.0f})'.format(**summary))
+    print('average game length {average_plies:.1f} plies, {nodes_per_second:.0f} nodes/s per worker'.format(**summary))
+    print('total time {:.1f}s'.format(time.perf_counter() - start_time))
+
+
+if __name__ == '__main__':
+    main()